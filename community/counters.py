@@ -0,0 +1,40 @@
+# community/counters.py
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from community.models import AchievementPost, Comment, Like
+
+
+def adjust_counters(post_id, likes=0, comments=0):
+    """
+    Add to a post's like and comment counters in one UPDATE, using F()
+    expressions so concurrent likes and comments never overwrite each
+    other. Counters never drop below zero.
+    """
+    updates = {}
+    if likes:
+        updates['like_count'] = Greatest(F('like_count') + likes, 0)
+    if comments:
+        updates['comment_count'] = Greatest(F('comment_count') + comments, 0)
+    if updates:
+        AchievementPost.objects.filter(pk=post_id).update(**updates)
+
+
+def _count(model):
+    rows = (
+        model.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(n=Count('pk')).values('n')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def rebuild_counters(post_ids):
+    """
+    Recount the likes and comments of the given posts, in one UPDATE.
+    Returns the number of posts updated.
+    """
+    return AchievementPost.objects.filter(id__in=post_ids).update(
+        like_count=_count(Like),
+        comment_count=_count(Comment),
+    )
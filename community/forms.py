@@ -0,0 +1,23 @@
+from django import forms
+from .models import AchievementPost, Comment
+
+
+class PostForm(forms.ModelForm):
+    class Meta:
+        model = AchievementPost
+        fields = ['title', 'content', 'image']
+        widgets = {
+            'content': forms.Textarea(attrs={'rows': 5}),
+        }
+
+
+class CommentForm(forms.ModelForm):
+    class Meta:
+        model = Comment
+        fields = ['content']
+        widgets = {
+            'content': forms.Textarea(attrs={'rows': 3}),
+        }
+        labels = {
+            'content': 'Add a comment',
+        }
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from community.counters import rebuild_counters
+from community.models import AchievementPost
+
+
+class Command(BaseCommand):
+    help = 'Recount the denormalized like and comment counters on every achievement post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(
+                AchievementPost.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated += rebuild_counters(ids)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {updated} posts.'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='achievementpost',
+            index=models.Index(fields=['-created_on', '-id'], name='achievement_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    AchievementPost = apps.get_model('community', 'AchievementPost')
+    Like = apps.get_model('community', 'Like')
+    Comment = apps.get_model('community', 'Comment')
+
+    def count(model):
+        rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(rows), 0)
+
+    AchievementPost.objects.update(like_count=count(Like), comment_count=count(Comment))
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_achievement_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievementpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='achievementpost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created_on', '-id'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -9,6 +9,16 @@ class AchievementPost(models.Model):
     image = models.ImageField(upload_to='achievements/', blank=True, null=True)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
+    # Kept in step by community.signals and like_post; repair with
+    # rebuild_post_counters
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Serves the keyset-paginated feed (community.views.posts)
+            models.Index(fields=['-created_on', '-id'], name='achievement_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -21,6 +31,12 @@ class Comment(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Pages through a post's comments, newest first
+            models.Index(fields=['post', '-created_on', '-id'], name='comment_thread_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on '{self.post.title}'"
 
@@ -1,3 +1,113 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .models import AchievementPost, Comment, Like
+
+
+class FeedQueryBudgetTests(TestCase):
+    """
+    Feed pages must cost the same number of queries however many posts,
+    likes and comments there are.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        cls.others = [
+            User.objects.create_user(username=f'athlete{i}', password='pass12345')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_post(self, author, likes=(), comments=0):
+        post = AchievementPost.objects.create(user=author, title='New PB', content='100kg squat')
+        for user in likes:
+            Like.objects.create(post=post, user=user)
+        for i in range(comments):
+            Comment.objects.create(post=post, user=author, content=f'Comment {i}')
+        return post
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_feed_query_count_is_constant(self):
+        self.create_post(self.others[0])
+        baseline = self.count_queries(reverse('community:posts'))
+        feed_baseline = self.count_queries(reverse('community:feed_page'))
+
+        for author in self.others:
+            self.create_post(author, likes=[self.user, *self.others], comments=3)
+        self.assertEqual(self.count_queries(reverse('community:posts')), baseline)
+        self.assertEqual(self.count_queries(reverse('community:feed_page')), feed_baseline)
+
+    def test_post_detail_query_count_is_constant(self):
+        quiet = self.create_post(self.others[0])
+        baseline = self.count_queries(reverse('community:post_detail', args=[quiet.id]))
+
+        busy = self.create_post(self.others[1], likes=self.others, comments=10)
+        self.assertEqual(
+            self.count_queries(reverse('community:post_detail', args=[busy.id])),
+            baseline,
+        )
+
+    def test_like_toggle_rejects_get(self):
+        post = self.create_post(self.others[0])
+        response = self.client.get(reverse('community:like_post', args=[post.id]))
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(Like.objects.exists())
+
+    def test_like_toggle_requires_csrf_token(self):
+        post = self.create_post(self.others[0])
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+
+        response = client.post(reverse('community:like_post', args=[post.id]))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Like.objects.exists())
+
+
+class LikeCounterTests(TestCase):
+    """
+    A post's like_count follows likes and unlikes, and a like removed
+    twice is only uncounted once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='pass12345')
+        cls.fan = User.objects.create_user(username='fan1', password='pass12345')
+        cls.other_fan = User.objects.create_user(username='fan2', password='pass12345')
+        cls.post = AchievementPost.objects.create(user=cls.author, title='New PB', content='100kg squat')
+
+    def like_count(self):
+        self.post.refresh_from_db()
+        return self.post.like_count
+
+    def toggle_like(self, user):
+        self.client.force_login(user)
+        return self.client.post(reverse('community:like_post', args=[self.post.id]))
+
+    def test_like_and_unlike(self):
+        self.toggle_like(self.fan)
+        self.assertEqual(self.like_count(), 1)
+        self.toggle_like(self.fan)
+        self.assertEqual(self.like_count(), 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_like_deleted_twice_is_uncounted_once(self):
+        self.toggle_like(self.fan)
+        self.toggle_like(self.other_fan)
+        stale = Like.objects.get(user=self.fan)
+
+        self.toggle_like(self.fan)
+        # A concurrent unlike that loaded the same row deletes it again
+        stale.delete()
+        self.assertEqual(self.like_count(), 1)
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'community'
+
+urlpatterns = [
+    path('', views.posts, name='posts'),
+    path('feed/', views.feed_page, name='feed_page'),
+    path('new/', views.create_post, name='create_post'),
+    path('<int:post_id>/', views.post_detail, name='post_detail'),
+    path('<int:post_id>/like/', views.like_post, name='like_post'),
+]
@@ -1,21 +1,70 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_POST
 from .models import AchievementPost, Comment, Like
 from .forms import PostForm, CommentForm
+from .counters import adjust_counters
+from core.pagination import keyset_paginate
+
+POSTS_PER_PAGE = 12
+COMMENTS_PER_PAGE = 20
+FEED_ORDERING = ('-created_on', '-id')
+
+
+def _annotated_posts(request):
+    """
+    Posts with their author and whether the current user likes them, in
+    the one query; like and comment counts are columns on the post.
+    """
+    if request.user.is_authenticated:
+        liked = Exists(Like.objects.filter(post=OuterRef('pk'), user=request.user))
+    else:
+        liked = Value(False)
+    return AchievementPost.objects.select_related('user').annotate(user_has_liked=liked)
+
+
+def _feed_page(request):
+    return keyset_paginate(
+        _annotated_posts(request),
+        FEED_ORDERING,
+        cursor=request.GET.get('cursor'),
+        page_size=POSTS_PER_PAGE,
+    )
+
 
 def posts(request):
-    all_posts = AchievementPost.objects.all().order_by('-created_at')
-    return render(request, 'community/posts.html', {'posts': all_posts})
+    """
+    Show the community feed, newest first, one keyset page at a time, so
+    every page costs one query however long the feed grows.
+    """
+    page = _feed_page(request)
+    return render(request, 'community/posts.html', {
+        'posts': page,
+        'next_cursor': page.next_cursor,
+    })
+
+
+def feed_page(request):
+    """
+    Next page of the feed as JSON for infinite scroll: the rendered post
+    cards and the cursor of the page after it.
+    """
+    page = _feed_page(request)
+    html = render_to_string('community/includes/post_list.html', {'posts': page}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': page.next_cursor})
+
 
 def post_detail(request, post_id):
-    post = get_object_or_404(AchievementPost, id=post_id)
-    comments = post.comments.all().order_by('-created_at')
-    
-    # Check if current user has liked the post
-    user_has_liked = False
-    if request.user.is_authenticated:
-        user_has_liked = Like.objects.filter(post=post, user=request.user).exists()
+    """
+    Show a post with its newest comments, older ones a keyset page at a
+    time, and take new comments.
+    """
+    post = get_object_or_404(_annotated_posts(request), id=post_id)
     
     if request.method == 'POST' and request.user.is_authenticated:
         comment_form = CommentForm(request.POST)
@@ -23,18 +72,26 @@ def post_detail(request, post_id):
             new_comment = comment_form.save(commit=False)
             new_comment.post = post
             new_comment.user = request.user
-            new_comment.save()
+            with transaction.atomic():
+                new_comment.save()
             messages.success(request, 'Your comment has been added!')
             return redirect('community:post_detail', post_id=post.id)
     else:
         comment_form = CommentForm()
     
+    comments = keyset_paginate(
+        post.comments.select_related('user'),
+        ('-created_on', '-id'),
+        cursor=request.GET.get('cursor'),
+        page_size=COMMENTS_PER_PAGE,
+    )
     return render(request, 'community/post_detail.html', {
         'post': post,
         'comments': comments,
+        'next_cursor': comments.next_cursor,
         'comment_form': comment_form,
-        'user_has_liked': user_has_liked,
-        'like_count': post.likes.count()
+        'user_has_liked': post.user_has_liked,
+        'like_count': post.like_count
     })
 
 @login_required
@@ -53,16 +110,19 @@ def create_post(request):
     return render(request, 'community/create_post.html', {'form': form})
 
 @login_required
+@require_POST
 def like_post(request, post_id):
-    post = get_object_or_404(AchievementPost, id=post_id)
-    
-    # Check if user already liked the post
-    like, created = Like.objects.get_or_create(
-        post=post,
-        user=request.user
-    )
-    
-    if not created:
-        like.delete()
+    post = get_object_or_404(AchievementPost.objects.only('id'), id=post_id)
     
+    # Unlike if the user already liked the post, otherwise like it. Only the
+    # request whose DELETE removed the row takes the like off like_count, so
+    # two concurrent unlikes cannot count it twice; new likes are counted by
+    # community.signals.
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(post=post, user=request.user).delete()
+        if deleted:
+            adjust_counters(post.id, likes=-1)
+        else:
+            Like.objects.get_or_create(post=post, user=request.user)
+
     return redirect('community:post_detail', post_id=post.id)
\ No newline at end of file
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, StripeEvent
 
 # Register your models here.
 
@@ -23,4 +23,12 @@ class CustomUserAdmin(UserAdmin):
 
 
 admin.site.unregister(User)
-admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(User, CustomUserAdmin)
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'source', 'event_type', 'status', 'attempts', 'received_on', 'next_attempt_on', 'processed_on')
+    list_filter = ('status', 'source', 'event_type')
+    search_fields = ('=event_id',)
+    readonly_fields = ('received_on', 'processed_on')
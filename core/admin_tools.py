@@ -0,0 +1,85 @@
+# core/admin_tools.py
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
+
+# Below this many rows an exact COUNT(*) is cheap enough to keep
+ESTIMATE_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large tables: an unfiltered changelist on PostgreSQL
+    takes its row count from the planner statistics instead of running
+    COUNT(*) over the whole table. Filtered lists, small tables and other
+    databases still count exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+def estimated_row_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 until the table has been analyzed
+    return row[0] if row and row[0] >= 0 else None
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows: estimated
+    counts, no second COUNT(*) for the unfiltered total, and search by
+    exact id, username or email, which can use indexes where a
+    LIKE '%term%' over joined tables cannot. Emails are compared
+    lower-cased, matching the LOWER(email) index added by core's
+    migrations.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_user_field = 'user'
+    search_help_text = 'Exact id, username or email.'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip().lstrip('#')
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        users = (
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(Q(username=term) | Q(email_lower=term.lower()))
+            .values('pk')
+        )
+        return queryset.filter(**{f'{self.search_user_field}__in': users}), False
+
+
+class ReadOnlyReportAdmin(admin.ModelAdmin):
+    """Admin for rollup tables, which only their own modules write."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
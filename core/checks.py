@@ -0,0 +1,32 @@
+# core/checks.py
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Warning, register
+
+# Backends that keep entries in the memory of one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias='default'):
+    """
+    Whether every process sees the same entries in the cache `alias`, so
+    an invalidation made by one (a worker, a management command) reaches
+    the others.
+    """
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+@register()
+def check_inbox_cache(app_configs, **kwargs):
+    if getattr(settings, 'STRIPE_WEBHOOK_MODE', 'sync') == 'inbox' and not cache_is_shared():
+        return [Warning(
+            'STRIPE_WEBHOOK_MODE is "inbox" but the default cache is local to each process.',
+            hint='The event worker cannot invalidate the web processes\' caches. '
+                 'Set REDIS_URL (or another shared cache backend) or use "sync" mode.',
+            id='core.W001',
+        )]
+    return []
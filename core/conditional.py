@@ -0,0 +1,45 @@
+# core/conditional.py
+
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+
+def public_condition(etag_func=None, last_modified_func=None):
+    """
+    Conditional GET for pages that are identical for every anonymous
+    visitor. Anonymous requests get ETag/Last-Modified validation (and
+    304s) plus a public Cache-Control, so a CDN or reverse proxy can serve
+    them; it should bypass its cache for requests carrying a session
+    cookie. Signed-in users, visitors with a flash message waiting, and
+    pages rendered with a CSRF token get the full page marked private.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.user.is_authenticated or len(get_messages(request)):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                return response
+
+            response = conditional_view(request, *args, **kwargs)
+            if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                # The page embeds this visitor's CSRF token and the response
+                # sets their cookie; neither may be shared
+                patch_cache_control(response, private=True)
+            elif response.status_code in (200, 304):
+                patch_cache_control(
+                    response,
+                    public=True,
+                    max_age=getattr(settings, 'CATALOG_CACHE_SECONDS', 60),
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        return inner
+    return decorator
@@ -0,0 +1,195 @@
+# core/images.py
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+
+logger = logging.getLogger(__name__)
+
+# Derivative name -> longest edge in pixels
+DERIVATIVES = {
+    'thumbnail': 150,
+    'card': 400,
+    'full': 1200,
+}
+# File extension -> Pillow format
+FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+QUALITY = 82
+WIDTHS_TIMEOUT = 60 * 60 * 24
+MISSING_WIDTHS_TIMEOUT = 60
+
+# (model, field name) pairs whose uploads get derivatives
+TRACKED_FIELDS = []
+
+_UNKNOWN = object()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_name(name, size, ext='webp'):
+    """
+    Storage name of a derivative, stored alongside the original:
+    products/bar.jpg -> products/bar.card.webp
+    """
+    root, _ = os.path.splitext(name)
+    return f'{root}.{size}.{ext}'
+
+
+def render_derivatives(data):
+    """
+    Resize the original image bytes into every size and format. Runs in a
+    worker process. EXIF is applied to the orientation and then dropped,
+    since Pillow only writes metadata it is explicitly given.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    outputs = {}
+    widths = {}
+    for size, edge in DERIVATIVES.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)  # Never upscales
+        widths[size] = resized.width
+        for ext, image_format in FORMATS.items():
+            frame = resized.convert('RGB') if image_format == 'JPEG' else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, image_format, quality=QUALITY, optimize=image_format == 'JPEG')
+            outputs[(size, ext)] = buffer.getvalue()
+    return outputs, widths
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+            )
+        return _executor
+
+
+def manifest_name(name):
+    """
+    Storage name of the JSON file listing an image's derivative widths,
+    written last, so its presence means every derivative exists.
+    """
+    return derivative_name(name, 'widths', 'json')
+
+
+def _widths_key(name):
+    return 'images:widths:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def derivative_widths(name, storage=None):
+    """
+    Return {size: pixel width} of the derivatives generated for the image
+    `name`, or {} if they do not exist (yet, or ever). Cached; a missing
+    manifest is only remembered briefly, as generation runs after upload.
+    """
+    storage = storage or default_storage
+    key = _widths_key(name)
+    widths = cache.get(key)
+    if widths is None:
+        try:
+            with storage.open(manifest_name(name), 'rb') as manifest:
+                widths = json.load(manifest)
+        except (OSError, ValueError):
+            widths = {}
+        cache.set(key, widths, WIDTHS_TIMEOUT if widths else MISSING_WIDTHS_TIMEOUT)
+    return widths
+
+
+def save_derivatives(name, storage, rendered):
+    outputs, widths = rendered
+    for (size, ext), content in outputs.items():
+        target = derivative_name(name, size, ext)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(content))
+    manifest = manifest_name(name)
+    if storage.exists(manifest):
+        storage.delete(manifest)
+    storage.save(manifest, ContentFile(json.dumps(widths).encode()))
+    cache.set(_widths_key(name), widths, WIDTHS_TIMEOUT)
+
+
+def delete_derivatives(name, storage):
+    storage.delete(manifest_name(name))
+    cache.delete(_widths_key(name))
+    for size in DERIVATIVES:
+        for ext in FORMATS:
+            storage.delete(derivative_name(name, size, ext))
+
+
+def generate_derivatives(field_file):
+    """
+    Queue derivative generation for an uploaded image on the process pool.
+    Returns a future; the derivatives are saved when it completes. Returns
+    None if the original cannot be read, e.g. a name set without a file.
+    """
+    name, storage = field_file.name, field_file.storage
+    try:
+        with storage.open(name, 'rb') as original:
+            data = original.read()
+    except OSError:
+        logger.warning('Could not read %s to generate image derivatives', name)
+        return None
+
+    future = get_executor().submit(render_derivatives, data)
+
+    def done(future):
+        try:
+            save_derivatives(name, storage, future.result())
+        except Exception:
+            logger.exception('Could not generate image derivatives for %s', name)
+
+    future.add_done_callback(done)
+    return future
+
+
+def track_image_field(model, field_name):
+    """
+    Generate derivatives whenever `field_name` on `model` gets a new file,
+    and remove the derivatives of the file it replaced.
+    """
+    TRACKED_FIELDS.append((model, field_name))
+    attr = f'_original_{field_name}'
+
+    def remember(sender, instance, **kwargs):
+        # Read the raw value so deferred fields are not loaded one query per row
+        value = instance.__dict__.get(field_name, _UNKNOWN)
+        setattr(instance, attr, getattr(value, 'name', value))
+
+    def process(sender, instance, created, **kwargs):
+        previous = getattr(instance, attr, _UNKNOWN)
+        if previous is _UNKNOWN:
+            return
+        field_file = getattr(instance, field_name)
+        if field_file.name == previous and not created:
+            return
+        setattr(instance, attr, field_file.name)
+        if previous and not created:
+            transaction.on_commit(lambda: delete_derivatives(previous, field_file.storage))
+        if field_file.name:
+            transaction.on_commit(lambda: generate_derivatives(field_file))
+
+    post_init.connect(remember, sender=model, weak=False)
+    post_save.connect(process, sender=model, weak=False)
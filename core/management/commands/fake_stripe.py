@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.management.commands.send_test_stripe_event import build_event
+from core.webhooks import sign_payload
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a local fake Stripe API for load tests. Point STRIPE_API_BASE at it; '
+        'it answers Checkout session creation and can fire the completed webhook.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--addr', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help='Milliseconds to wait before answering, to mimic the real API.')
+        parser.add_argument('--webhook-url',
+                            help='Send checkout.session.completed here for every session created.')
+        parser.add_argument('--webhook-delay', type=float, default=0.5,
+                            help='Seconds between creating a session and sending its webhook.')
+        parser.add_argument('--secret', default=settings.STRIPE_WEBHOOK_SECRET)
+
+    def handle(self, *args, **options):
+        handler = type('Handler', (FakeStripeHandler,), {
+            'latency': options['latency'] / 1000,
+            'webhook_url': options['webhook_url'],
+            'webhook_delay': options['webhook_delay'],
+            'webhook_secret': options['secret'],
+        })
+        server = ThreadingHTTPServer((options['addr'], options['port']), handler)
+        server.daemon_threads = True
+        self.stdout.write(f'Fake Stripe listening on http://{options["addr"]}:{options["port"]}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """
+    Just enough of the Stripe API for checkout: keep-alive connections,
+    form-encoded requests and JSON responses.
+    """
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40ms to every keep-alive response.
+    disable_nagle_algorithm = True
+    latency = 0.0
+    webhook_url = None
+    webhook_delay = 0.5
+    webhook_secret = ''
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        if self.latency:
+            time.sleep(self.latency)
+        if self.path.split('?')[0] != '/v1/checkout/sessions':
+            return self.respond(404, {'error': {'type': 'invalid_request_error',
+                                                'message': f'Unrecognized request URL (POST: {self.path})'}})
+
+        params = parse_qsl(body)
+        metadata = {key[9:-1]: value for key, value in params if key.startswith('metadata[')}
+        session_id = f'cs_test_{uuid.uuid4().hex}'
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'mode': dict(params).get('mode', 'payment'),
+            'status': 'open',
+            # Send the browser straight back, as if the card was paid instantly
+            'url': dict(params).get('success_url', ''),
+            'payment_intent': None,
+            'metadata': metadata,
+        }
+        self.respond(200, session)
+        if self.webhook_url:
+            threading.Timer(self.webhook_delay, self.send_webhook, args=(session_id, metadata)).start()
+
+    def respond(self, status, data):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Request-Id', f'req_{uuid.uuid4().hex[:14]}')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_webhook(self, session_id, metadata):
+        payload = json.dumps(build_event('checkout.session.completed', metadata, session_id=session_id))
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=payload.encode(),
+            headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_payload(payload, self.webhook_secret),
+            },
+            method='POST',
+        )
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except (urllib.error.URLError, OSError) as e:
+            self.log_message('Webhook for %s failed: %s', session_id, e)
+
+    def log_request(self, code='-', size='-'):
+        pass  # One line per request would swamp a load test
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from core.images import TRACKED_FIELDS, render_derivatives, save_derivatives, get_executor
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG derivatives for existing uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Images held in memory at once.')
+
+    def handle(self, *args, **options):
+        self.executor = get_executor()
+        self.generated = self.failed = 0
+
+        for model, field_name in TRACKED_FIELDS:
+            queryset = (
+                model.objects.exclude(**{field_name: ''})
+                .exclude(**{f'{field_name}__isnull': True})
+                .only('pk', field_name)
+            )
+            jobs = []
+            for instance in queryset.iterator():
+                field_file = getattr(instance, field_name)
+                try:
+                    with field_file.storage.open(field_file.name, 'rb') as original:
+                        data = original.read()
+                except OSError:
+                    self.stderr.write(f'Missing file {field_file.name}')
+                    self.failed += 1
+                    continue
+                jobs.append((field_file, self.executor.submit(render_derivatives, data)))
+                if len(jobs) >= options['batch_size']:
+                    self.finish(jobs)
+                    jobs = []
+            self.finish(jobs)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated derivatives for {self.generated} images, {self.failed} failed.'
+        ))
+
+    def finish(self, jobs):
+        for field_file, future in jobs:
+            try:
+                save_derivatives(field_file.name, field_file.storage, future.result())
+                self.generated += 1
+            except Exception as e:
+                self.stderr.write(f'Could not process {field_file.name}: {e}')
+                self.failed += 1
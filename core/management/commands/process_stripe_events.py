@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.webhooks import RETRY_BASE_SECONDS, process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Process Stripe webhook events stored in the inbox, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Mark an event failed after this many errors.')
+        parser.add_argument('--retry-delay', type=float, default=RETRY_BASE_SECONDS,
+                            help='Seconds before the first retry of a failed event; doubles per attempt.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new events instead of exiting once drained.')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait between polls when the inbox is empty.')
+
+    def handle(self, *args, **options):
+        total_processed = total_failed = 0
+        while True:
+            processed, failed = process_pending_events(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                retry_base=options['retry_delay'],
+            )
+            total_processed += processed
+            total_failed += failed
+            if processed or failed:
+                self.stdout.write(f'Processed {processed} events, {failed} failed.')
+            if processed:
+                continue  # Failed events wait for their retry time
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {total_processed} processed, {total_failed} failed.'
+        ))
@@ -0,0 +1,78 @@
+import json
+import uuid
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.webhooks import sign_payload
+
+
+class Command(BaseCommand):
+    help = 'Send a signed fake Stripe event to a local webhook endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/store/webhook/')
+        parser.add_argument('--type', default='checkout.session.completed', dest='event_type')
+        parser.add_argument('--event-id', help='Reuse an id to test deduplication.')
+        parser.add_argument('--session-id', help='Checkout session id, random by default.')
+        parser.add_argument('--payment-intent', help='Payment intent id, random by default.')
+        parser.add_argument('--metadata', nargs='*', default=[], metavar='KEY=VALUE',
+                            help='Checkout session metadata, e.g. user_id=1 plan_id=2.')
+        parser.add_argument('--secret', default=settings.STRIPE_WEBHOOK_SECRET)
+
+    def handle(self, *args, **options):
+        if not options['secret']:
+            raise CommandError('Set STRIPE_WEBHOOK_SECRET or pass --secret.')
+
+        try:
+            metadata = dict(item.split('=', 1) for item in options['metadata'])
+        except ValueError:
+            raise CommandError('Metadata must be given as KEY=VALUE pairs.')
+
+        event = build_event(
+            options['event_type'],
+            metadata,
+            event_id=options['event_id'],
+            session_id=options['session_id'],
+            payment_intent=options['payment_intent'],
+        )
+        payload = json.dumps(event)
+        request = urllib.request.Request(
+            options['url'],
+            data=payload.encode(),
+            headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_payload(payload, options['secret']),
+            },
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except urllib.error.URLError as e:
+            raise CommandError(f'Could not reach {options["url"]}: {e.reason}')
+
+        self.stdout.write(f'{event["id"]} ({event["type"]}) -> HTTP {status}')
+
+
+def build_event(event_type, metadata, event_id=None, session_id=None, payment_intent=None):
+    """
+    Build a minimal Stripe event wrapping a checkout session.
+    """
+    return {
+        'id': event_id or f'evt_test_{uuid.uuid4().hex}',
+        'object': 'event',
+        'type': event_type,
+        'data': {
+            'object': {
+                'id': session_id or f'cs_test_{uuid.uuid4().hex}',
+                'object': 'checkout.session',
+                'payment_intent': payment_intent or f'pi_test_{uuid.uuid4().hex}',
+                'metadata': metadata,
+            },
+        },
+    }
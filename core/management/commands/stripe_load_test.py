@@ -0,0 +1,52 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.stripe_gateway import create_checkout_session, gateway_stats, reset_gateway_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Create Checkout sessions through the Stripe gateway from several threads '
+        'and report throughput and latency. Run it against `manage.py fake_stripe`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+
+    def handle(self, *args, **options):
+        def create(i):
+            try:
+                create_checkout_session(
+                    payment_method_types=['card'],
+                    line_items=[{
+                        'price_data': {
+                            'currency': 'usd',
+                            'product_data': {'name': 'Load test'},
+                            'unit_amount': 1000,
+                        },
+                        'quantity': 1,
+                    }],
+                    mode='payment',
+                    success_url='http://127.0.0.1:8000/store/order/success/',
+                    cancel_url='http://127.0.0.1:8000/store/order/cancel/',
+                    metadata={'load_test': i},
+                )
+            except Exception:
+                pass  # Counted as an error by the gateway
+
+        reset_gateway_stats()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(create, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        for operation, stats in gateway_stats().items():
+            self.stdout.write(
+                f'{operation}: {stats["calls"]} calls, {stats["errors"]} errors, '
+                f'{stats["calls"] / elapsed:.0f}/s, mean {stats["mean_ms"]:.1f} ms, '
+                f'p50 {stats["p50_ms"]:.1f} ms, p95 {stats["p95_ms"]:.1f} ms, '
+                f'p99 {stats["p99_ms"]:.1f} ms, max {stats["max_ms"]:.1f} ms'
+            )
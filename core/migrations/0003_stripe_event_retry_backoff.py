@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_stripeevent'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stripeevent',
+            name='stripe_event_queue_idx',
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='next_attempt_on',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='stripeevent',
+            index=models.Index(fields=['status', 'next_attempt_on', 'id'], name='stripe_event_due_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Serves the exact, case-insensitive email search of the large admin
+    # changelists (core.admin_tools), which filters on LOWER(email).
+    # auth.User is not ours to give a Meta index, hence the raw SQL.
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0003_stripe_event_retry_backoff'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX core_user_email_lower_idx ON auth_user (LOWER(email))',
+            'DROP INDEX core_user_email_lower_idx',
+        ),
+    ]
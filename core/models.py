@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django_countries.fields import CountryField
 
 # Create your models here.
@@ -19,4 +20,38 @@ class UserProfile(models.Model):
     updated_on = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return f"{self.user.username}'s Profile"
\ No newline at end of file
+        return f"{self.user.username}'s Profile"
+
+class StripeEvent(models.Model):
+    """Raw Stripe webhook event waiting to be processed by the worker."""
+    PENDING = 'pending'
+    PROCESSED = 'processed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSED, 'Processed'),
+        (FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255)
+    source = models.CharField(max_length=50)  # The app whose endpoint received it
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_on = models.DateTimeField(auto_now_add=True)
+    # Failed attempts push this back, so retries wait instead of spinning
+    next_attempt_on = models.DateTimeField(default=timezone.now)
+    processed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'event_id'], name='unique_stripe_event_per_source')
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_on', 'id'], name='stripe_event_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
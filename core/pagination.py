@@ -0,0 +1,92 @@
+# core/pagination.py
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset.
+    """
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _after(queryset, ordering, values):
+    """
+    Build the filter selecting rows strictly after `values` in `ordering`,
+    e.g. (a < x) OR (a = x AND id < y) for descending (a, id).
+    """
+    model_fields = queryset.model._meta
+    condition = Q()
+    equal = Q()
+    for field_name, raw in zip(ordering, values):
+        name = field_name.lstrip('-')
+        value = model_fields.get_field(name).to_python(raw)
+        lookup = 'lt' if field_name.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return queryset.filter(condition)
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=24):
+    """
+    Return a KeysetPage of `queryset` ordered by `ordering`, starting after
+    `cursor`. The last field of `ordering` must be unique (usually the pk),
+    and an index on the ordering keeps every page as cheap as the first.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor) if cursor else None
+    if values and len(values) == len(ordering):
+        try:
+            queryset = _after(queryset, ordering, values)
+        except (ValidationError, TypeError):
+            pass  # Malformed cursor, start from the first page
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([
+            _serialize(getattr(last, field_name.lstrip('-')))
+            for field_name in ordering
+        ])
+    return KeysetPage(rows, next_cursor)
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return str(value)
@@ -0,0 +1,178 @@
+# core/stripe_gateway.py
+
+import http.client
+import logging
+import ssl
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+import stripe
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per operation for the percentile figures
+LATENCY_SAMPLES = 1000
+
+_configured = False
+_configure_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class PooledHTTPClient(stripe.HTTPClient):
+    """
+    Stripe HTTP client that keeps one keep-alive connection per host in
+    each thread, so a worker pays for the TCP and TLS handshake once
+    instead of on every API call. Network errors are raised as retryable,
+    which lets stripe-python retry them with its own backoff and jitter.
+    """
+    name = 'pooled-http.client'
+
+    def __init__(self, timeout=10, **kwargs):
+        super().__init__(**kwargs)
+        self._timeout = timeout
+        self._ssl_context = None
+
+    def _connections(self):
+        if not hasattr(self._thread_local, 'connections'):
+            self._thread_local.connections = {}
+        return self._thread_local.connections
+
+    def _get_connection(self, scheme, netloc):
+        connections = self._connections()
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            if scheme == 'https':
+                if self._ssl_context is None:
+                    if self._verify_ssl_certs:
+                        self._ssl_context = ssl.create_default_context(cafile=stripe.ca_bundle_path)
+                    else:
+                        self._ssl_context = ssl._create_unverified_context()
+                connection = http.client.HTTPSConnection(
+                    netloc, timeout=self._timeout, context=self._ssl_context
+                )
+            else:
+                connection = http.client.HTTPConnection(netloc, timeout=self._timeout)
+            connections[(scheme, netloc)] = connection
+        return connection
+
+    def _drop_connection(self, scheme, netloc):
+        connection = self._connections().pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def request(self, method, url, headers, post_data=None, *, _usage=None):
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        connection = self._get_connection(parts.scheme, parts.netloc)
+        try:
+            connection.request(method.upper(), path, body=post_data, headers=headers or {})
+            response = connection.getresponse()
+            content = response.read().decode('utf-8')
+        except (OSError, http.client.HTTPException) as e:
+            # A half-closed keep-alive socket is never reused
+            self._drop_connection(parts.scheme, parts.netloc)
+            raise stripe.APIConnectionError(
+                f'Could not reach Stripe at {parts.netloc}: {e!r}', should_retry=True
+            ) from e
+        if response.will_close:
+            self._drop_connection(parts.scheme, parts.netloc)
+        return content, response.status, response.headers
+
+    def close(self):
+        for key in list(self._connections()):
+            self._drop_connection(*key)
+
+
+def configure():
+    """
+    Point stripe-python at the pooled client once per process, using the
+    STRIPE_* settings. STRIPE_API_BASE lets load tests aim it at the local
+    fake server started by `manage.py fake_stripe`.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe.api_base = getattr(settings, 'STRIPE_API_BASE', stripe.api_base)
+        stripe.max_network_retries = getattr(settings, 'STRIPE_MAX_NETWORK_RETRIES', 2)
+        stripe.default_http_client = PooledHTTPClient(
+            timeout=getattr(settings, 'STRIPE_TIMEOUT', 10)
+        )
+        _configured = True
+
+
+def _record(operation, elapsed, failed):
+    with _stats_lock:
+        stats = _stats.get(operation)
+        if stats is None:
+            stats = _stats[operation] = {
+                'calls': 0,
+                'errors': 0,
+                'total': 0.0,
+                'samples': deque(maxlen=LATENCY_SAMPLES),
+            }
+        stats['calls'] += 1
+        stats['errors'] += failed
+        stats['total'] += elapsed
+        stats['samples'].append(elapsed)
+
+
+def _call(operation, func, **params):
+    configure()
+    started = time.perf_counter()
+    failed = True
+    try:
+        result = func(**params)
+        failed = False
+        return result
+    finally:
+        elapsed = time.perf_counter() - started
+        _record(operation, elapsed, failed)
+        if failed:
+            logger.warning('Stripe %s failed after %.0f ms', operation, elapsed * 1000)
+
+
+def create_checkout_session(**params):
+    """
+    Create a Stripe Checkout session through the pooled client.
+    """
+    return _call('checkout.session.create', stripe.checkout.Session.create, **params)
+
+
+def gateway_stats():
+    """
+    Per-operation call counts, error counts and latency in milliseconds,
+    with percentiles over the most recent calls.
+    """
+    with _stats_lock:
+        snapshot = {
+            operation: (stats['calls'], stats['errors'], stats['total'], sorted(stats['samples']))
+            for operation, stats in _stats.items()
+        }
+
+    def percentile(samples, fraction):
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+    return {
+        operation: {
+            'calls': calls,
+            'errors': errors,
+            'mean_ms': total / calls * 1000,
+            'p50_ms': percentile(samples, 0.50),
+            'p95_ms': percentile(samples, 0.95),
+            'p99_ms': percentile(samples, 0.99),
+            'max_ms': samples[-1] * 1000,
+        }
+        for operation, (calls, errors, total, samples) in snapshot.items()
+    }
+
+
+def reset_gateway_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,56 @@
+from django import template
+
+from core.images import DERIVATIVES, derivative_name, derivative_widths
+
+register = template.Library()
+
+
+def _url(image, size, ext):
+    return image.storage.url(derivative_name(image.name, size, ext))
+
+
+@register.filter
+def derivative_url(image, size, ext='webp'):
+    """
+    URL of a resized copy of an image field, e.g. {{ product.image|derivative_url:'card' }}.
+    Falls back to the original until the derivatives have been generated.
+    """
+    if not image:
+        return ''
+    if size not in derivative_widths(image.name, image.storage):
+        return image.url
+    return _url(image, size, ext)
+
+
+@register.simple_tag
+def image_srcset(image, ext='webp'):
+    """
+    srcset value listing every derivative at its real width, e.g. {% image_srcset product.image %}.
+    Empty until the derivatives have been generated.
+    """
+    if not image:
+        return ''
+    widths = derivative_widths(image.name, image.storage)
+    candidates = {}
+    for size in DERIVATIVES:
+        # Small originals are never upscaled, so sizes can share a width
+        if size in widths and widths[size] not in candidates:
+            candidates[widths[size]] = _url(image, size, ext)
+    return ', '.join(f'{url} {width}w' for width, url in candidates.items())
+
+
+@register.inclusion_tag('core/includes/picture.html')
+def picture(image, alt='', size='card', sizes='100vw', css_class=''):
+    """
+    <picture> element serving WebP with a JPEG fallback, or the original
+    image alone while it has no derivatives.
+    """
+    return {
+        'image': image,
+        'alt': alt,
+        'sizes': sizes,
+        'css_class': css_class,
+        'src': derivative_url(image, size, 'jpg'),
+        'webp_srcset': image_srcset(image, 'webp'),
+        'jpg_srcset': image_srcset(image, 'jpg'),
+    }
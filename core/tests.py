@@ -1,3 +1,107 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import StripeEvent
+from .webhooks import HANDLERS, process_pending_events, retry_delay, sign_payload
+
+handled = []
+
+
+def record_event(event):
+    handled.append(event['id'])
+
+
+def fail_event(event):
+    raise RuntimeError('Stripe is down')
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test', STRIPE_WEBHOOK_MODE='inbox')
+class WebhookInboxTests(TestCase):
+    """
+    Inbox mode stores each verified event once and the worker retries
+    failures with a growing delay until they are marked failed.
+    """
+
+    def setUp(self):
+        handled.clear()
+
+    def post_event(self, event_id='evt_1'):
+        payload = json.dumps({
+            'id': event_id,
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {'object': {'id': 'cs_test'}},
+        })
+        return self.client.post(
+            reverse('store:stripe_webhook'),
+            payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, 'whsec_test'),
+        )
+
+    def create_event(self, source, event_id='evt_1'):
+        return StripeEvent.objects.create(
+            event_id=event_id,
+            source=source,
+            event_type='checkout.session.completed',
+            payload={'id': event_id, 'object': 'event', 'type': 'checkout.session.completed'},
+        )
+
+    def test_redelivered_event_is_stored_once(self):
+        self.assertEqual(self.post_event().status_code, 200)
+        self.assertEqual(self.post_event().status_code, 200)
+        self.assertEqual(StripeEvent.objects.filter(event_id='evt_1').count(), 1)
+
+    def test_bad_signature_is_rejected(self):
+        response = self.client.post(
+            reverse('store:stripe_webhook'), '{}', content_type='application/json',
+            HTTP_STRIPE_SIGNATURE='t=1,v1=bad',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    @mock.patch.dict(HANDLERS, {'test': 'core.tests.record_event'})
+    def test_processes_due_events(self):
+        self.create_event('test', 'evt_1')
+        self.create_event('test', 'evt_2')
+
+        self.assertEqual(process_pending_events(), (2, 0))
+        self.assertEqual(handled, ['evt_1', 'evt_2'])
+        self.assertFalse(StripeEvent.objects.exclude(status=StripeEvent.PROCESSED).exists())
+        self.assertEqual(process_pending_events(), (0, 0))
+
+    @mock.patch.dict(HANDLERS, {'test': 'core.tests.fail_event'})
+    def test_failed_event_waits_before_retrying(self):
+        inbox_event = self.create_event('test')
+
+        self.assertEqual(process_pending_events(retry_base=30), (0, 1))
+        inbox_event.refresh_from_db()
+        self.assertEqual(inbox_event.status, StripeEvent.PENDING)
+        self.assertEqual(inbox_event.attempts, 1)
+        self.assertIn('Stripe is down', inbox_event.last_error)
+        self.assertGreater(inbox_event.next_attempt_on, timezone.now() + timedelta(seconds=25))
+
+        # Not due yet, so an immediate second run leaves it alone
+        self.assertEqual(process_pending_events(retry_base=30), (0, 0))
+        inbox_event.refresh_from_db()
+        self.assertEqual(inbox_event.attempts, 1)
+
+    @mock.patch.dict(HANDLERS, {'test': 'core.tests.fail_event'})
+    def test_event_fails_after_max_attempts(self):
+        inbox_event = self.create_event('test')
+
+        for attempt in range(3):
+            StripeEvent.objects.filter(pk=inbox_event.pk).update(next_attempt_on=timezone.now())
+            process_pending_events(max_attempts=3)
+        inbox_event.refresh_from_db()
+        self.assertEqual(inbox_event.status, StripeEvent.FAILED)
+        self.assertEqual(inbox_event.attempts, 3)
+
+    def test_retry_delay_doubles_up_to_the_cap(self):
+        self.assertEqual([retry_delay(n, 30) for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(retry_delay(20, 30), 3600)
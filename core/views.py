@@ -18,8 +18,8 @@ def index(request):
 @login_required
 def profile(request):
     user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-    subscriptions = request.user.usersubscription_set.select_related('plan').order_by('-start_date')
-    orders = request.user.order_set.order_by('-created_on')[:5]
+    subscriptions = request.user.usersubscription_set.select_related('plan').order_by('-start_date')[:10]
+    orders = request.user.orders.order_by('-created_on')[:5]
 
     # Calculate age if date_of_birth is set
     if user_profile.date_of_birth:
@@ -32,6 +32,7 @@ def profile(request):
     return render(request, 'core/profile.html', {
         'user_profile': user_profile,
         'subscriptions': subscriptions,
+        'active_subscription': request.active_subscription,
         'orders': orders
     })
 
@@ -0,0 +1,129 @@
+# core/webhooks.py
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+import stripe
+
+from .models import StripeEvent
+
+logger = logging.getLogger(__name__)
+
+# Event handlers for each webhook endpoint, called with a stripe.Event.
+HANDLERS = {
+    'store': 'store.views.handle_stripe_event',
+    'subscriptions': 'subscriptions.views.handle_stripe_event',
+}
+
+SYNC_MODE = 'sync'
+INBOX_MODE = 'inbox'
+
+# Backoff between attempts at a failing inbox event
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+
+
+def receive_stripe_event(request, source):
+    """
+    Verify a Stripe webhook request and either handle it immediately or,
+    in inbox mode, store it for the worker and acknowledge straight away.
+    """
+    payload = request.body
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
+
+    try:
+        event = stripe.Webhook.construct_event(
+            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.error.SignatureVerificationError):
+        return HttpResponse(status=400)
+
+    if getattr(settings, 'STRIPE_WEBHOOK_MODE', INBOX_MODE) == SYNC_MODE:
+        import_string(HANDLERS[source])(event)
+    else:
+        try:
+            with transaction.atomic():
+                StripeEvent.objects.create(
+                    event_id=event['id'],
+                    source=source,
+                    event_type=event['type'],
+                    payload=json.loads(payload),
+                )
+        except IntegrityError:
+            pass  # Stripe redelivered an event we already have
+
+    return HttpResponse(status=200)
+
+
+def retry_delay(attempts, base=RETRY_BASE_SECONDS):
+    """
+    Seconds to wait before the next attempt at an event that has failed
+    `attempts` times: doubling from `base`, capped at RETRY_MAX_SECONDS.
+    """
+    return min(base * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def process_pending_events(batch_size=100, max_attempts=5, retry_base=RETRY_BASE_SECONDS):
+    """
+    Handle up to `batch_size` pending inbox events that are due, oldest
+    first. Each event is claimed, handled and marked in its own
+    transaction, so a finished event is committed at once and holds no
+    locks while the rest of the batch runs. A failed event's changes are
+    rolled back and it is retried after an exponential backoff, so a
+    transient error cannot use up its attempts at once.
+    Returns a (processed, failed) tuple.
+    """
+    processed = failed = 0
+    for _ in range(batch_size):
+        with transaction.atomic():
+            now = timezone.now()
+            inbox_event = (
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=StripeEvent.PENDING, next_attempt_on__lte=now)
+                .order_by('next_attempt_on', 'id')
+                .first()
+            )
+            if inbox_event is None:
+                break
+            inbox_event.attempts += 1
+            try:
+                with transaction.atomic():
+                    event = stripe.Event.construct_from(inbox_event.payload, stripe.api_key)
+                    import_string(HANDLERS[inbox_event.source])(event)
+            except Exception as e:
+                logger.exception('Stripe event %s failed', inbox_event.event_id)
+                inbox_event.last_error = repr(e)
+                if inbox_event.attempts >= max_attempts:
+                    inbox_event.status = StripeEvent.FAILED
+                else:
+                    inbox_event.next_attempt_on = now + timedelta(
+                        seconds=retry_delay(inbox_event.attempts, retry_base)
+                    )
+                failed += 1
+            else:
+                inbox_event.status = StripeEvent.PROCESSED
+                inbox_event.processed_on = timezone.now()
+                processed += 1
+            inbox_event.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_on', 'processed_on'])
+    return processed, failed
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """
+    Build a Stripe-Signature header for `payload`, as Stripe would, so fake
+    events can be sent to the webhook endpoints locally.
+    """
+    timestamp = int(timestamp or time.time())
+    signed = f'{timestamp}.{payload}'.encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
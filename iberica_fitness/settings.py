@@ -64,6 +64,12 @@ MIDDLEWARE = [
     # Middleware required by allauth
     'allauth.account.middleware.AccountMiddleware',
 
+    # Writes the cart once per request (see store.cart)
+    'store.middleware.CartMiddleware',
+
+    # Lazy, cached request.active_subscription (see subscriptions.access)
+    'subscriptions.middleware.ActiveSubscriptionMiddleware',
+
 ]
 
 ROOT_URLCONF = 'iberica_fitness.urls'
@@ -124,6 +130,31 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The catalog, plan and subscription caches are invalidated by whichever
+# process changes the data, so every process must share one cache: set
+# REDIS_URL in production. Without it each process keeps its own memory
+# cache, which only suits a single process.
+
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -164,9 +195,35 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Worker processes used to resize uploaded images (see core.images)
+IMAGE_DERIVATIVE_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-CART_SESSION_ID = 'cart'
\ No newline at end of file
+CART_SESSION_ID = 'cart'
+# store.cart_storage.SessionCartStorage, SignedCookieCartStorage or DatabaseCartStorage
+CART_STORAGE = 'store.cart_storage.SessionCartStorage'
+
+# Seconds browsers and shared caches may reuse anonymous catalog pages
+CATALOG_CACHE_SECONDS = 60
+
+# How long checkout holds stock while the customer is on Stripe
+STOCK_RESERVATION_MINUTES = 30
+
+# Stripe
+STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
+# 'inbox' stores verified webhook events for `manage.py process_stripe_events`
+# and acknowledges immediately; 'sync' handles them inside the request.
+# Inbox mode needs the shared cache above: the worker's cache invalidations
+# must reach the web processes. Without REDIS_URL it defaults to 'sync'.
+STRIPE_WEBHOOK_MODE = os.environ.get('STRIPE_WEBHOOK_MODE', 'inbox' if REDIS_URL else 'sync')
+# Seconds before an API call to Stripe is abandoned, and how many times a
+# failed connection is retried (with backoff and jitter) before giving up.
+STRIPE_TIMEOUT = 5
+STRIPE_MAX_NETWORK_RETRIES = 2
+# Set to the `manage.py fake_stripe` address to load-test offline.
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE', 'https://api.stripe.com')
@@ -1,26 +1,104 @@
 from django.contrib import admin
-from .models import ProductCategory, Product, ProductReview, Order, OrderItem
+from django.db.models import Max, Min, Sum
+from .models import ProductCategory, Product, ProductReview, Order, OrderItem, DailySales, ProductSales
+from .search import search_product_ids
+from core.admin_tools import EstimatedCountPaginator, LargeTableAdminMixin, ReadOnlyReportAdmin
+
+ADMIN_SEARCH_LIMIT = 1000
+TOP_PRODUCTS = 10
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
-    raw_id_fields = ['product']
+    autocomplete_fields = ['product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'created_on', 'total', 'is_paid')
     list_filter = ('is_paid', 'created_on')
-    search_fields = ('user__username', 'id')
+    list_select_related = ('user',)
+    search_fields = ('=id', '=user__username', '=user__email')
+    search_help_text = 'Exact order number, username or email.'
+    autocomplete_fields = ['user']
     inlines = [OrderItemInline]
 
 
+@admin.register(ProductCategory)
+class ProductCategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'is_active')
     list_filter = ('category', 'is_active')
+    list_select_related = ('category',)
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
+    autocomplete_fields = ['category']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of LIKE '%term%' scans
+        if not search_term:
+            return queryset, False
+        ids = search_product_ids(search_term, limit=ADMIN_SEARCH_LIMIT, active_only=False)
+        return queryset.filter(id__in=ids), False
+
+
+@admin.register(ProductReview)
+class ProductReviewAdmin(admin.ModelAdmin):
+    list_display = ('product', 'user', 'rating', 'created_on')
+    list_filter = ('rating',)
+    list_select_related = ('product', 'user')
+    autocomplete_fields = ['product', 'user']
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyReportAdmin):
+    """
+    Sales report built from the rollup tables only, so it costs the same
+    however many orders there are.
+    """
+    list_display = ('date', 'order_count', 'item_count', 'revenue')
+    date_hierarchy = 'date'
+    change_list_template = 'admin/store/dailysales/change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            days = response.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return response  # A redirect or an error page
+
+        summary = days.aggregate(
+            orders=Sum('order_count'),
+            items=Sum('item_count'),
+            revenue=Sum('revenue'),
+            first=Min('date'),
+            last=Max('date'),
+        )
+        top_products = []
+        if summary['first']:
+            top_products = (
+                ProductSales.objects.filter(date__range=(summary['first'], summary['last']))
+                .values('product_id', 'product__name')
+                .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+                .order_by('-revenue')[:TOP_PRODUCTS]
+            )
+        response.context_data.update(summary=summary, top_products=top_products)
+        return response
 
 
-admin.site.register(ProductCategory)
-admin.site.register(ProductReview)
\ No newline at end of file
+@admin.register(ProductSales)
+class ProductSalesAdmin(ReadOnlyReportAdmin):
+    list_display = ('date', 'product', 'quantity', 'revenue')
+    list_select_related = ('product',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('product',)
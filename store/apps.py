@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from core.images import track_image_field
+        track_image_field(self.get_model('Product'), 'image')
+        post_migrate.connect(ensure_search_index, sender=self)
+
+
+def ensure_search_index(using, **kwargs):
+    """
+    SQLite rebuilds tables on some schema changes, dropping the full-text
+    triggers; reinstall them after every migrate.
+    """
+    from django.db import connections
+    from .search import install_search_index
+    connection = connections[using]
+    if 'store_product' in connection.introspection.table_names():
+        install_search_index(connection)
@@ -1,59 +1,136 @@
 # store/cart.py
 
 from decimal import Decimal
-from django.conf import settings
-from store.models import Product
+
+from store.cart_storage import get_cart_storage
+from store.snapshots import get_snapshots
+
+# Compact encoding layout: parallel product id / quantity / unit price in cents arrays.
+ENCODING_VERSION = 1
+
 
 class Cart:
-    def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+    """
+    The visitor's cart. Every Cart(request) in a request shares one
+    instance, mutations only mark it modified, and CartMiddleware writes
+    it to the configured storage once when the response goes out.
+    """
+
+    def __new__(cls, request):
+        cart = getattr(request, '_cart', None)
+        if cart is None:
+            cart = super().__new__(cls)
+            cart._load(request)
+            request._cart = cart
+        return cart
+
+    def _load(self, request):
+        self.storage = get_cart_storage(request)
+        self.lines = decode(self.storage.load())  # product id -> [quantity, unit cents]
+        self.modified = False
+        self._count = sum(quantity for quantity, _ in self.lines.values())
+        self._total_cents = sum(quantity * cents for quantity, cents in self.lines.values())
 
     def add(self, product, quantity=1, override_quantity=False):
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.price)
-            }
-        if override_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
+        line = self.lines.setdefault(product.id, [0, to_cents(product.price)])
+        new_quantity = quantity if override_quantity else line[0] + quantity
+        self._set_quantity(line, new_quantity)
         self.save()
 
+    def _set_quantity(self, line, quantity):
+        self._count += quantity - line[0]
+        self._total_cents += (quantity - line[0]) * line[1]
+        line[0] = quantity
+
     def save(self):
-        self.session[settings.CART_SESSION_ID] = self.cart
-        self.session.modified = True
+        self.modified = True
 
     def remove(self, product):
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
+        line = self.lines.pop(product.id, None)
+        if line is not None:
+            self._count -= line[0]
+            self._total_cents -= line[0] * line[1]
             self.save()
 
     def clear(self):
-        self.session[settings.CART_SESSION_ID] = {}
-        self.session.modified = True
+        self.lines = {}
+        self._count = 0
+        self._total_cents = 0
+        self.save()
+
+    def flush(self, response):
+        """
+        Write the cart to storage if it changed during this request.
+        """
+        if self.modified:
+            self.storage.save(encode(self.lines), response)
+            self.modified = False
 
     def __iter__(self):
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        for product in products:
-            item = self.cart[str(product.id)]
-            item['product'] = product
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+        snapshots = get_snapshots(self.lines.keys())
+        for product_id, (quantity, cents) in self.lines.items():
+            product = snapshots.get(product_id)
+            if product is None:
+                continue
+            price = from_cents(cents)
+            yield {
+                'product': product,
+                'quantity': quantity,
+                'price': price,
+                'total_price': price * quantity,
+            }
 
     def __len__(self):
-        return sum(item['quantity'] for item in self.cart.values())
+        return self._count
 
     def get_total_price(self):
-        return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
+        return from_cents(self._total_cents)
 
     def is_empty(self):
-        return len(self.cart) == 0
+        return len(self.lines) == 0
+
+
+def merge_cart_data(data, other):
+    """
+    Combine two encoded carts, adding up the quantities of shared products.
+    """
+    lines = decode(data)
+    for product_id, (quantity, cents) in decode(other).items():
+        line = lines.setdefault(product_id, [0, cents])
+        line[0] += quantity
+    return encode(lines)
+
+
+def to_cents(price):
+    return int((Decimal(price) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def encode(lines):
+    if not lines:
+        return None
+    ids = list(lines)
+    return {
+        'v': ENCODING_VERSION,
+        'ids': ids,
+        'qty': [lines[product_id][0] for product_id in ids],
+        'cents': [lines[product_id][1] for product_id in ids],
+    }
+
+
+def decode(data):
+    if not data:
+        return {}
+    if data.get('v') == ENCODING_VERSION:
+        return {
+            product_id: [quantity, cents]
+            for product_id, quantity, cents in zip(data['ids'], data['qty'], data['cents'])
+        }
+    # Carts saved before the compact encoding: {'<id>': {'quantity': n, 'price': '9.99'}}
+    return {
+        int(product_id): [item['quantity'], to_cents(item['price'])]
+        for product_id, item in data.items()
+    }
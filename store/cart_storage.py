@@ -0,0 +1,121 @@
+# store/cart_storage.py
+
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from store.models import StoredCart
+
+DEFAULT_STORAGE = 'store.cart_storage.SessionCartStorage'
+
+
+def get_cart_storage(request):
+    """
+    Instantiate the backend named by settings.CART_STORAGE for this request.
+    """
+    return import_string(getattr(settings, 'CART_STORAGE', DEFAULT_STORAGE))(request)
+
+
+class SessionCartStorage:
+    """
+    Keep the encoded cart in the session.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        return self.request.session.get(settings.CART_SESSION_ID)
+
+    def save(self, data, response):
+        if data:
+            self.request.session[settings.CART_SESSION_ID] = data
+        else:
+            self.request.session.pop(settings.CART_SESSION_ID, None)
+
+
+class SignedCookieCartStorage:
+    """
+    Keep the encoded cart in a signed cookie, so carts never touch the
+    database. Suited to small carts: browsers cap cookies at about 4KB.
+    """
+    cookie_name = 'cart'
+    salt = 'store.cart'
+    max_age = 60 * 60 * 24 * 30
+
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        value = self.request.COOKIES.get(self.cookie_name)
+        if not value:
+            return None
+        try:
+            return signing.loads(value, salt=self.salt, max_age=self.max_age)
+        except signing.BadSignature:
+            return None
+
+    def save(self, data, response):
+        if data:
+            response.set_cookie(
+                self.cookie_name,
+                signing.dumps(data, salt=self.salt, compress=True),
+                max_age=self.max_age,
+                httponly=True,
+                samesite='Lax',
+                secure=self.request.is_secure(),
+            )
+        else:
+            response.delete_cookie(self.cookie_name, samesite='Lax')
+
+
+class DatabaseCartStorage:
+    """
+    Keep the encoded cart in its own table, keyed by user (or, for
+    anonymous visitors, by a token kept in their session, which survives
+    the session key changing at login), so cart writes do not rewrite the
+    session row.
+    """
+    token_session_key = 'cart_token'
+
+    def __init__(self, request):
+        self.request = request
+
+    @property
+    def key(self):
+        user = self.request.user
+        if user.is_authenticated:
+            return f'user:{user.id}'
+        session = self.request.session
+        if self.token_session_key not in session:
+            session[self.token_session_key] = uuid.uuid4().hex
+        return f'session:{session[self.token_session_key]}'
+
+    def load(self, key=None):
+        return StoredCart.objects.filter(key=key or self.key).values_list('data', flat=True).first()
+
+    def save(self, data, response, key=None):
+        key = key or self.key
+        if data:
+            StoredCart.objects.update_or_create(key=key, defaults={'data': data})
+        else:
+            StoredCart.objects.filter(key=key).delete()
+
+    def claim_anonymous_cart(self, user, merge):
+        """
+        Fold the cart the visitor filled before signing in as `user` into
+        theirs, combining the two with `merge(user_data, anonymous_data)`.
+        """
+        token = self.request.session.pop(self.token_session_key, None)
+        if token is None:
+            return
+        with transaction.atomic():
+            anonymous = StoredCart.objects.select_for_update().filter(key=f'session:{token}').first()
+            if anonymous is None:
+                return
+            user_key = f'user:{user.id}'
+            self.save(merge(self.load(user_key), anonymous.data), None, key=user_key)
+            anonymous.delete()
@@ -0,0 +1,95 @@
+# store/catalog.py
+
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+from store.models import ProductCategory
+
+CATEGORIES_CACHE_KEY = 'store:categories'
+CATEGORIES_TIMEOUT = 60 * 60
+# Listing versions: microsecond timestamps of the last change per category
+VERSION_KEY = 'store:catalog-version:{}'
+ALL_PRODUCTS = 'all'
+CATEGORY_LIST = 'categories'
+
+# Sort modes offered on the catalog page, as keyset orderings ending in a unique field.
+SORT_ORDERINGS = {
+    'newest': ('-created_on', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'rating': ('-rating_avg', '-id'),
+}
+DEFAULT_SORT = 'newest'
+
+
+def get_categories():
+    """
+    Return all product categories, cached until a category changes.
+    """
+    categories = cache.get(CATEGORIES_CACHE_KEY)
+    if categories is None:
+        categories = list(ProductCategory.objects.order_by('name'))
+        cache.set(CATEGORIES_CACHE_KEY, categories, CATEGORIES_TIMEOUT)
+    return categories
+
+
+def get_category(slug):
+    """
+    Look up a category by slug from the cached list.
+    """
+    for category in get_categories():
+        if category.slug == slug:
+            return category
+    return None
+
+
+def invalidate_categories():
+    cache.delete(CATEGORIES_CACHE_KEY)
+
+
+def _version_key(scope):
+    return VERSION_KEY.format(scope)
+
+
+def _now_version():
+    return time.time_ns() // 1000
+
+
+def bump_catalog_version(*category_ids):
+    """
+    Mark the listings of the given categories, and the all-products
+    listing, as changed.
+    """
+    version = _now_version()
+    scopes = {ALL_PRODUCTS, *(category_id for category_id in category_ids if category_id)}
+    cache.set_many({_version_key(scope): version for scope in scopes}, timeout=None)
+
+
+def bump_category_list_version():
+    """
+    Mark every listing as changed, as they all show the category list.
+    """
+    cache.set(_version_key(CATEGORY_LIST), _now_version(), timeout=None)
+
+
+def listing_version(category_id=None):
+    """
+    Version of a product listing page: the newer of its own version and
+    the category list's. A version missing from the cache restarts at now,
+    which can only cause a spurious full response, never a stale 304.
+    """
+    keys = [_version_key(category_id or ALL_PRODUCTS), _version_key(CATEGORY_LIST)]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = _now_version()
+        for key in missing:
+            cache.add(key, now, timeout=None)  # Another process may have set it first
+            versions[key] = cache.get(key, now)
+    return max(versions.values())
+
+
+def version_datetime(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=timezone.utc)
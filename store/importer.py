@@ -0,0 +1,234 @@
+# store/importer.py
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.text import slugify
+
+from store.catalog import invalidate_categories, bump_category_list_version
+from store.models import Product, ProductCategory, StockReservation
+from store.snapshots import invalidate_snapshots
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+SLUG_LENGTH = Product._meta.get_field('slug').max_length
+CATEGORY_SLUG_LENGTH = ProductCategory._meta.get_field('slug').max_length
+# Invalid rows kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(stream, format):
+    """
+    Yield feed rows as dicts, one at a time, from a CSV or JSON Lines stream.
+    Unparseable lines are yielded as None so they are reported, not fatal.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+
+
+def category_slug(name):
+    return slugify(name)[:CATEGORY_SLUG_LENGTH]
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def clean_row(row):
+    """
+    Normalise a feed row into Product field values keyed by slug. Only the
+    columns present in the row are returned, so a feed can update a subset;
+    empty cells count as absent.
+    """
+    if not isinstance(row, dict):
+        raise RowError('not a JSON object')
+    values = {}
+    name = (row.get('name') or '').strip()
+    slug = (row.get('slug') or '').strip() or slugify(name)[:SLUG_LENGTH]
+    if not slug:
+        raise RowError('needs a slug or a name')
+    if name:
+        values['name'] = name
+    if row.get('description') not in (None, ''):
+        values['description'] = row['description']
+    if row.get('price') not in (None, ''):
+        try:
+            values['price'] = Decimal(str(row['price'])).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise RowError(f'invalid price {row["price"]!r}')
+    if row.get('stock') not in (None, ''):
+        try:
+            values['stock'] = int(row['stock'])
+        except (TypeError, ValueError):
+            raise RowError(f'invalid stock {row["stock"]!r}')
+        if values['stock'] < 0:
+            raise RowError('stock cannot be negative')
+    if row.get('image'):
+        values['image'] = row['image']
+    if row.get('is_active') not in (None, ''):
+        values['is_active'] = str(row['is_active']).strip().lower() in TRUE_VALUES
+    category = (row.get('category') or '').strip()
+    if category:
+        values['category'] = category
+    return slug, values
+
+
+class ProductImporter:
+    """
+    Upsert products from feed rows in batches, keyed by slug. Rows that
+    carry a name, price and category create or overwrite products with
+    one INSERT ... ON CONFLICT per batch; partial rows (say slug, price,
+    stock) only update products that already exist. Memory stays flat:
+    only the current batch and the category slug -> id map are held.
+    Feed stock is what is on the shelf: units held by pending checkouts
+    (see store.reservations) are taken off it, as reserving already did.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.category_ids = dict(ProductCategory.objects.values_list('slug', 'id'))
+        self.categories_changed = False
+        self.upserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, rows, progress=None):
+        processed = 0
+        for batch in batched(enumerate(rows, 1), self.batch_size):
+            self.import_batch(batch)
+            processed += len(batch)
+            if progress:
+                progress(processed)
+        if self.categories_changed:
+            invalidate_categories()
+        if self.upserted or self.updated:
+            bump_category_list_version()  # Marks every listing as changed
+        return processed
+
+    def import_batch(self, numbered_rows):
+        upserts, updates = {}, {}
+        for number, row in numbered_rows:
+            try:
+                slug, values = clean_row(row)
+            except RowError as e:
+                self.error_count += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append((number, str(e)))
+                continue
+            # Later rows for the same slug win, as ON CONFLICT rejects duplicates
+            if {'name', 'price', 'category'} <= values.keys():
+                upserts[slug] = values
+                updates.pop(slug, None)
+            else:
+                updates[slug] = values
+                upserts.pop(slug, None)
+
+        with transaction.atomic():
+            self.ensure_categories(
+                {values['category'] for values in (*upserts.values(), *updates.values()) if 'category' in values}
+            )
+            self.upsert_products(upserts)
+            self.update_products(updates)
+            self.subtract_held_stock(
+                [slug for slug, values in (*upserts.items(), *updates.items()) if 'stock' in values]
+            )
+
+        invalidate_snapshots(
+            Product.objects.filter(slug__in=[*upserts, *updates]).values_list('id', flat=True)
+        )
+
+    def ensure_categories(self, names):
+        missing = {category_slug(name): name for name in names}
+        missing = {slug: name for slug, name in missing.items() if slug not in self.category_ids}
+        if not missing:
+            return
+        ProductCategory.objects.bulk_create(
+            [ProductCategory(slug=slug, name=name) for slug, name in missing.items()],
+            ignore_conflicts=True,
+        )
+        self.category_ids.update(
+            ProductCategory.objects.filter(slug__in=missing).values_list('slug', 'id')
+        )
+        self.categories_changed = True
+
+    def category_id(self, values):
+        return self.category_ids[category_slug(values.pop('category'))]
+
+    def upsert_products(self, upserts):
+        for columns, rows in group_by_columns(upserts):
+            products = []
+            for slug, values in rows:
+                values['category_id'] = self.category_id(values)
+                products.append(Product(slug=slug, **{'description': '', 'stock': 0, **values}))
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=sorted(columns | {'updated_on'}),
+            )
+            self.upserted += len(products)
+
+    def update_products(self, updates):
+        if not updates:
+            return
+        existing = Product.objects.only('id', 'slug').in_bulk(list(updates), field_name='slug')
+        self.skipped += len(updates) - len(existing)
+        now = timezone.now()
+        for columns, rows in group_by_columns({slug: updates[slug] for slug in existing}):
+            products = []
+            for slug, values in rows:
+                product = existing[slug]
+                if 'category' in values:
+                    product.category_id = self.category_id(values)
+                for field, value in values.items():
+                    setattr(product, field, value)
+                product.updated_on = now
+                products.append(product)
+            Product.objects.bulk_update(products, sorted(columns | {'updated_on'}))
+            self.updated += len(products)
+
+    def subtract_held_stock(self, slugs):
+        if not slugs:
+            return
+        held = dict(
+            StockReservation.objects.filter(status=StockReservation.PENDING, product__slug__in=slugs)
+            .values('product_id').annotate(held=Sum('quantity')).values_list('product_id', 'held')
+        )
+        if held:
+            Product.objects.filter(id__in=held).update(stock=Case(
+                *[When(id=product_id, then=Greatest(F('stock') - quantity, 0))
+                  for product_id, quantity in held.items()],
+                default=F('stock'),
+                output_field=models.PositiveIntegerField(),
+            ))
+
+
+def group_by_columns(rows):
+    """
+    Group slug -> values rows by the columns they carry, so a column missing
+    from a row is never written back with a default or loaded per row.
+    """
+    groups = {}
+    for slug, values in rows.items():
+        groups.setdefault(frozenset(values), []).append((slug, values))
+    return groups.items()
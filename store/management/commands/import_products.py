@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importer import ProductImporter, read_rows
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Create or update products from a CSV or JSON Lines feed, streamed in batches. '
+        'Columns: slug, name, category, description, price, stock, image, is_active. '
+        'Rows are matched on slug (generated from the name when missing); rows without '
+        'a name, price and category only update products that already exist. Stock is the '
+        'count on the shelf; units held by pending checkouts are taken off it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file, or - to read from stdin.')
+        parser.add_argument('--format', choices=sorted(set(FORMATS.values())),
+                            help='Feed format; guessed from the file extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--progress-every', type=int, default=100000,
+                            help='Report progress after this many rows.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or FORMATS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise CommandError('Cannot tell the feed format; pass --format.')
+
+        importer = ProductImporter(batch_size=options['batch_size'])
+        started = time.monotonic()
+        next_report = options['progress_every']
+
+        def progress(processed):
+            nonlocal next_report
+            if processed >= next_report:
+                next_report += options['progress_every']
+                self.stdout.write(f'{processed} rows, {processed / (time.monotonic() - started):.0f} rows/s')
+
+        try:
+            if path == '-':
+                processed = importer.run(read_rows(sys.stdin, format), progress)
+            else:
+                with open(path, newline='', encoding='utf-8-sig') as stream:
+                    processed = importer.run(read_rows(stream, format), progress)
+        except OSError as e:
+            raise CommandError(f'Could not read {path}: {e}')
+        except UnicodeDecodeError as e:
+            raise CommandError(f'{path} is not UTF-8: {e}')
+
+        elapsed = time.monotonic() - started
+        for number, error in importer.errors:
+            self.stderr.write(f'Row {number}: {error}')
+        if importer.error_count > len(importer.errors):
+            self.stderr.write(f'... and {importer.error_count - len(importer.errors)} more invalid rows.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{processed} rows in {elapsed:.1f}s ({processed / max(elapsed, 1e-6):.0f} rows/s): '
+            f'{importer.upserted} created or replaced, {importer.updated} updated, '
+            f'{importer.skipped} unknown slugs skipped, {importer.error_count} invalid.'
+        ))
+        if importer.upserted:
+            self.stdout.write('Run generate_image_derivatives for any new product images.')
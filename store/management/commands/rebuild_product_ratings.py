@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from store.catalog import bump_category_list_version
+from store.models import Product
+from store.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating aggregates on every product.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Product.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated += rebuild_ratings(ids)
+            last_id = ids[-1]
+
+        bump_category_list_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {updated} products.'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.reservations import release_expired_reservations, purge_abandoned_checkouts
+
+
+class Command(BaseCommand):
+    help = 'Return the stock held by expired checkout reservations and purge abandoned checkouts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping instead of exiting once nothing has expired.')
+        parser.add_argument('--sleep', type=float, default=60.0,
+                            help='Seconds between sweeps in --loop mode.')
+
+    def handle(self, *args, **options):
+        while True:
+            released = 0
+            while True:
+                count = release_expired_reservations(batch_size=options['batch_size'])
+                released += count
+                if count < options['batch_size']:
+                    break
+            purged = purge_abandoned_checkouts()
+            self.stdout.write(f'Released {released} expired reservations, purged {purged} abandoned checkouts.')
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,15 @@
+class CartMiddleware:
+    """
+    Write the cart once per request, after the view has finished changing it.
+    Must come after SessionMiddleware so the session is saved afterwards.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cart = getattr(request, '_cart', None)
+        if cart is not None:
+            cart.flush(response)
+        return response
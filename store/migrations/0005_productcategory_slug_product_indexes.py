@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:05
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def populate_category_slugs(apps, schema_editor):
+    ProductCategory = apps.get_model('store', 'ProductCategory')
+    seen = set()
+    for category in ProductCategory.objects.order_by('id'):
+        slug = base = slugify(category.name) or f'category-{category.id}'
+        counter = 2
+        while slug in seen:
+            slug = f'{base}-{counter}'
+            counter += 1
+        seen.add(slug)
+        category.slug = slug
+        category.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_rename_created_at_order_created_on_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcategory',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=120, null=True),
+        ),
+        migrations.RunPython(populate_category_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productcategory',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=120, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-created_on', '-id'], name='product_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'price', 'id'], name='product_price_idx'),
+        ),
+    ]
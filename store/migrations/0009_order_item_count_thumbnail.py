@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_order_summaries(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    orders = Order.objects.annotate(units=Sum('items__quantity')).only('id')
+    for order in orders.iterator():
+        first_item = (
+            OrderItem.objects.filter(order_id=order.id)
+            .select_related('product').order_by('id').first()
+        )
+        Order.objects.filter(pk=order.pk).update(
+            item_count=order.units or 0,
+            thumbnail=first_item.product.image.name if first_item else '',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_stockreservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='thumbnail',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_on', '-id'], name='order_history_idx'),
+        ),
+        migrations.RunPython(backfill_order_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_sales(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    DailySales = apps.get_model('store', 'DailySales')
+    ProductSales = apps.get_model('store', 'ProductSales')
+
+    days = (
+        Order.objects.filter(is_paid=True)
+        .annotate(day=TruncDate('created_on')).values('day')
+        .annotate(orders=Count('id'), items=Sum('item_count'), total=Sum('total'))
+        .order_by()
+    )
+    DailySales.objects.bulk_create([
+        DailySales(date=row['day'], order_count=row['orders'], item_count=row['items'] or 0, revenue=row['total'])
+        for row in days.iterator()
+    ], batch_size=1000)
+
+    product_days = (
+        OrderItem.objects.filter(order__is_paid=True)
+        .annotate(day=TruncDate('order__created_on')).values('day', 'product_id')
+        .annotate(units=Sum('quantity'),
+                  total=Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2)))
+        .order_by()
+    )
+    ProductSales.objects.bulk_create([
+        ProductSales(date=row['day'], product_id=row['product_id'], quantity=row['units'], revenue=row['total'])
+        for row in product_days.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_pendingcheckout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='store.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Product sales',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_product_sales_per_day')],
+            },
+        ),
+        migrations.RunPython(backfill_sales, migrations.RunPython.noop),
+    ]
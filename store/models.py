@@ -1,13 +1,23 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.utils.text import slugify
+
+from core.images import derivative_name, derivative_widths
 
 
 class ProductCategory(models.Model):
     name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=120, unique=True, blank=True)
     description = models.TextField(blank=True)
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.name)
+        super().save(*args, **kwargs)
     
     class Meta:
         verbose_name_plural = "Product Categories"
@@ -25,9 +35,32 @@ class Product(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
+    # Review aggregates, kept up to date by store.ratings on review changes
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination for the catalog sort modes
+            models.Index(fields=['is_active', '-created_on', '-id'], name='product_newest_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='product_price_idx'),
+            models.Index(fields=['is_active', '-rating_avg', '-id'], name='product_rating_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @property
+    def rating_histogram(self):
+        """Review counts per star, from 5 down to 1."""
+        return [(star, getattr(self, f'rating_{star}')) for star in range(5, 0, -1)]
+
 
 class ProductReview(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
@@ -50,10 +83,26 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     is_paid = models.BooleanField(default=False)
     stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    # Denormalized for order lists, set when the order is fulfilled
+    item_count = models.PositiveIntegerField(default=0)
+    thumbnail = models.CharField(max_length=255, blank=True)  # Image name of the first product
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_on', '-id'], name='order_history_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+    @property
+    def thumbnail_url(self):
+        if not self.thumbnail:
+            return ''
+        if 'thumbnail' not in derivative_widths(self.thumbnail):
+            return default_storage.url(self.thumbnail)  # Not generated (yet)
+        return default_storage.url(derivative_name(self.thumbnail, 'thumbnail'))
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -64,3 +113,87 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
 
+
+
+class StockReservation(models.Model):
+    """Stock held for a checkout until it is paid, canceled or expires."""
+    PENDING = 'pending'
+    CONFIRMED = 'confirmed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (CONFIRMED, 'Confirmed'),
+        (RELEASED, 'Released'),
+    ]
+
+    reference = models.CharField(max_length=32, db_index=True)  # Shared by all lines of one checkout
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    expires_on = models.DateTimeField()
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_on'], name='reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} ({self.status})"
+
+
+class StoredCart(models.Model):
+    """Cart contents for the database cart storage backend."""
+    key = models.CharField(max_length=64, unique=True)  # 'user:<id>' or 'session:<key>'
+    data = models.JSONField()
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.key
+
+
+class PendingCheckout(models.Model):
+    """Priced cart lines for a Stripe checkout session, read back on fulfillment."""
+    stripe_session_id = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pending_checkouts')
+    lines = models.JSONField()  # [[product id, quantity, unit price], ...]
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    reservation = models.CharField(max_length=32, blank=True)
+    order = models.OneToOneField(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='checkout')
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.stripe_session_id
+
+
+class DailySales(models.Model):
+    """Paid order totals per day, kept up to date by store.sales."""
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue}"
+
+
+class ProductSales(models.Model):
+    """Units sold and revenue per product per day, kept up to date by store.sales."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales')
+    date = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Product sales"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_product_sales_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}: {self.quantity}"
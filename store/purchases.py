@@ -0,0 +1,41 @@
+# store/purchases.py
+
+from django.core.cache import cache
+
+from store.models import OrderItem
+
+PURCHASES_TIMEOUT = 60 * 60 * 24
+
+
+def _key(user_id):
+    return f'store:purchased:{user_id}'
+
+
+def purchased_product_ids(user):
+    """
+    Return the frozenset of product ids the user has paid for, cached per
+    user so eligibility checks for any number of products cost one lookup.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    product_ids = cache.get(_key(user.id))
+    if product_ids is None:
+        product_ids = frozenset(
+            OrderItem.objects.filter(order__user_id=user.id, order__is_paid=True)
+            .values_list('product_id', flat=True)
+            .distinct()
+        )
+        cache.set(_key(user.id), product_ids, PURCHASES_TIMEOUT)
+    return product_ids
+
+
+def has_purchased(user, product_id):
+    """
+    Return True if the user has a paid order containing the product.
+    """
+    return product_id in purchased_product_ids(user)
+
+
+def invalidate_purchases(user_id):
+    cache.delete(_key(user_id))
@@ -0,0 +1,82 @@
+# store/ratings.py
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast, Now, Round
+from django.utils import timezone
+
+from store.models import Product, ProductReview
+
+STARS = range(1, 6)
+
+
+def apply_rating_change(product_id, added=None, removed=None):
+    """
+    Update a product's rating aggregates in one UPDATE for a review rating
+    being added, removed, or changed (both given), using F() expressions so
+    concurrent reviews never overwrite each other. The product's updated_on
+    is bumped even when the rating is unchanged, as the page shows reviews.
+    """
+    if added == removed:
+        Product.objects.filter(pk=product_id).update(updated_on=Now())
+        return
+
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = (added or 0) - (removed or 0)
+    new_count = F('rating_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+
+    updates = {
+        'updated_on': Now(),
+        'rating_count': new_count,
+        'rating_sum': new_sum,
+        'rating_avg': Case(
+            When(rating_count__lte=-count_delta, then=0),
+            default=Round(Cast(new_sum, FloatField()) / new_count, 2),
+            output_field=FloatField(),
+        ),
+    }
+    if added is not None:
+        updates[f'rating_{added}'] = F(f'rating_{added}') + 1
+    if removed is not None:
+        updates[f'rating_{removed}'] = F(f'rating_{removed}') - 1
+
+    Product.objects.filter(pk=product_id).update(**updates)
+
+
+def rebuild_ratings(product_ids):
+    """
+    Recompute the rating aggregates of the given products from their reviews.
+    Returns the number of products updated.
+    """
+    aggregates = {
+        row['product']: row
+        for row in ProductReview.objects.filter(product__in=product_ids)
+        .values('product')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'star_{star}': Count('id', filter=Q(rating=star)) for star in STARS},
+        )
+    }
+
+    products = list(Product.objects.filter(id__in=product_ids).only('id'))
+    now = timezone.now()
+    for product in products:
+        product.updated_on = now
+        row = aggregates.get(product.id)
+        product.rating_count = row['count'] if row else 0
+        product.rating_sum = row['total'] if row else 0
+        product.rating_avg = (
+            (Decimal(product.rating_sum) / product.rating_count).quantize(Decimal('0.01'), ROUND_HALF_UP)
+            if row else Decimal(0)
+        )
+        for star in STARS:
+            setattr(product, f'rating_{star}', row[f'star_{star}'] if row else 0)
+
+    Product.objects.bulk_update(
+        products,
+        ['updated_on', 'rating_avg', 'rating_count', 'rating_sum'] + [f'rating_{star}' for star in STARS],
+    )
+    return len(products)
@@ -0,0 +1,145 @@
+# store/reservations.py
+
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from core.webhooks import RETRY_MAX_SECONDS
+from store.models import Product, StockReservation, PendingCheckout
+from store.snapshots import invalidate_snapshots
+
+# Extra time after the Stripe session expires before the sweeper releases
+# the stock, so a payment completed at the last second still finds it held
+# while its webhook waits out the inbox's retry backoff (which tops out at
+# an hour, see core.webhooks). Abandoned sessions are released sooner, by
+# their checkout.session.expired webhook.
+RESERVATION_GRACE = timedelta(seconds=RETRY_MAX_SECONDS)
+# Stripe checkout sessions live at most 24 hours
+ABANDONED_CHECKOUT_AGE = timedelta(hours=25)
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_MINUTES', 30))
+
+
+def reserve_stock(lines, ttl=None):
+    """
+    Take `lines` (product id -> quantity) out of stock for a checkout and
+    return the reservation reference. Each product is decremented with one
+    conditional UPDATE, so concurrent checkouts on a hot product only
+    contend for the duration of that statement. Raises InsufficientStock
+    and reserves nothing if any product runs short.
+    """
+    reference = uuid.uuid4().hex
+    expires_on = timezone.now() + (ttl or reservation_ttl()) + RESERVATION_GRACE
+
+    with transaction.atomic():
+        # Always touch rows in the same order so checkouts cannot deadlock
+        for product_id, quantity in sorted(lines.items()):
+            updated = Product.objects.filter(id=product_id, stock__gte=quantity).update(
+                stock=F('stock') - quantity, updated_on=Now()
+            )
+            if not updated:
+                raise InsufficientStock(f'Not enough stock for product {product_id}')
+
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                reference=reference,
+                product_id=product_id,
+                quantity=quantity,
+                expires_on=expires_on,
+            )
+            for product_id, quantity in lines.items()
+        ])
+
+    # Before commit, a concurrent read would re-cache the old stock
+    product_ids = list(lines)
+    transaction.on_commit(lambda: invalidate_snapshots(product_ids))
+    return reference
+
+
+def confirm_reservation(reference):
+    """
+    Mark a pending reservation as paid. Returns False if it does not exist
+    or was already released, in which case the stock is no longer held.
+    """
+    return StockReservation.objects.filter(
+        reference=reference, status=StockReservation.PENDING
+    ).update(status=StockReservation.CONFIRMED) > 0
+
+
+def _release(reservations):
+    """
+    Release the given pending reservations and return their stock. The
+    status change is guarded per row, so a reservation released by two
+    processes at once only returns its stock once.
+    """
+    restock = {}
+    released_count = 0
+    with transaction.atomic():
+        for reservation in reservations:
+            released = StockReservation.objects.filter(
+                pk=reservation.pk, status=StockReservation.PENDING
+            ).update(status=StockReservation.RELEASED)
+            if released:
+                released_count += 1
+                restock[reservation.product_id] = (
+                    restock.get(reservation.product_id, 0) + reservation.quantity
+                )
+
+        if restock:
+            Product.objects.filter(id__in=restock).update(
+                stock=Case(
+                    *[When(id=product_id, then=F('stock') + quantity)
+                      for product_id, quantity in restock.items()],
+                    default=F('stock'),
+                    output_field=models.PositiveIntegerField(),
+                ),
+                updated_on=Now(),
+            )
+
+    product_ids = list(restock)
+    transaction.on_commit(lambda: invalidate_snapshots(product_ids))
+    return released_count
+
+
+def release_reservation(reference):
+    """
+    Return the stock held by a checkout that was canceled or expired.
+    """
+    return _release(StockReservation.objects.filter(
+        reference=reference, status=StockReservation.PENDING
+    ).only('id', 'product_id', 'quantity'))
+
+
+def release_expired_reservations(batch_size=500, now=None):
+    """
+    Release one batch of expired reservations. Returns the number of
+    reservations examined, so callers can loop until it reaches zero.
+    """
+    expired = list(
+        StockReservation.objects.filter(
+            status=StockReservation.PENDING,
+            expires_on__lte=now or timezone.now(),
+        ).order_by('expires_on').only('id', 'product_id', 'quantity')[:batch_size]
+    )
+    _release(expired)
+    return len(expired)
+
+
+def purge_abandoned_checkouts(now=None):
+    """
+    Delete checkout snapshots whose Stripe session can no longer be paid.
+    """
+    cutoff = (now or timezone.now()) - ABANDONED_CHECKOUT_AGE
+    deleted, _ = PendingCheckout.objects.filter(order__isnull=True, created_on__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,106 @@
+# store/sales.py
+
+from itertools import islice
+
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from store.models import Order, OrderItem, DailySales, ProductSales
+
+REVENUE = DecimalField(max_digits=12, decimal_places=2)
+
+
+def record_sale(order, lines):
+    """
+    Add a paid order to the daily and per-product rollups. `lines` maps
+    product id -> (quantity, unit price). Call inside the transaction that
+    creates the order; every counter is bumped with F() expressions, so
+    concurrent orders on the same day never overwrite each other.
+    """
+    day = timezone.localdate(order.created_on)
+
+    DailySales.objects.bulk_create([DailySales(date=day)], ignore_conflicts=True)
+    DailySales.objects.filter(date=day).update(
+        order_count=F('order_count') + 1,
+        item_count=F('item_count') + order.item_count,
+        revenue=F('revenue') + order.total,
+    )
+
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=product_id, date=day) for product_id in lines],
+        ignore_conflicts=True,
+    )
+    ProductSales.objects.filter(date=day, product_id__in=lines).update(
+        quantity=Case(
+            *[When(product_id=product_id, then=F('quantity') + quantity)
+              for product_id, (quantity, _) in lines.items()],
+            default=F('quantity'),
+            output_field=models.PositiveIntegerField(),
+        ),
+        revenue=Case(
+            *[When(product_id=product_id, then=F('revenue') + quantity * price)
+              for product_id, (quantity, price) in lines.items()],
+            default=F('revenue'),
+            output_field=REVENUE,
+        ),
+    )
+
+
+def rebuild_sales(start=None, end=None, batch_size=1000):
+    """
+    Recompute the rollups from paid orders, for every day or for the days
+    from `start` to `end` inclusive. Returns the number of days rebuilt.
+    """
+    orders = Order.objects.filter(is_paid=True)
+    items = OrderItem.objects.filter(order__is_paid=True)
+    daily = DailySales.objects.all()
+    product_daily = ProductSales.objects.all()
+    if start:
+        orders = orders.filter(created_on__date__gte=start)
+        items = items.filter(order__created_on__date__gte=start)
+        daily = daily.filter(date__gte=start)
+        product_daily = product_daily.filter(date__gte=start)
+    if end:
+        orders = orders.filter(created_on__date__lte=end)
+        items = items.filter(order__created_on__date__lte=end)
+        daily = daily.filter(date__lte=end)
+        product_daily = product_daily.filter(date__lte=end)
+
+    days = (
+        orders.annotate(day=TruncDate('created_on'))
+        .values('day')
+        .annotate(orders=Count('id'), items=Sum('item_count'), total=Sum('total'))
+        .order_by('day')
+    )
+    product_days = (
+        items.annotate(day=TruncDate('order__created_on'))
+        .values('day', 'product_id')
+        .annotate(units=Sum('quantity'), total=Sum(F('quantity') * F('price'), output_field=REVENUE))
+        .order_by('day', 'product_id')
+    )
+
+    with transaction.atomic():
+        daily.delete()
+        product_daily.delete()
+        rebuilt = 0
+        for batch in _batched(days.iterator(), batch_size):
+            DailySales.objects.bulk_create([
+                DailySales(date=row['day'], order_count=row['orders'],
+                           item_count=row['items'] or 0, revenue=row['total'])
+                for row in batch
+            ])
+            rebuilt += len(batch)
+        for batch in _batched(product_days.iterator(), batch_size):
+            ProductSales.objects.bulk_create([
+                ProductSales(date=row['day'], product_id=row['product_id'],
+                             quantity=row['units'], revenue=row['total'])
+                for row in batch
+            ])
+    return rebuilt
+
+
+def _batched(rows, size):
+    while batch := list(islice(rows, size)):
+        yield batch
@@ -0,0 +1,129 @@
+# store/search.py
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from store.models import Product
+
+SQLITE_TABLE = 'store_product_fts'
+SQLITE_TRIGGERS = {
+    'store_product_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS store_product_fts_ai AFTER INSERT ON store_product BEGIN
+            INSERT INTO {SQLITE_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END""",
+    'store_product_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS store_product_fts_ad AFTER DELETE ON store_product BEGIN
+            INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END""",
+    'store_product_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS store_product_fts_au AFTER UPDATE OF name, description ON store_product BEGIN
+            INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO {SQLITE_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END""",
+}
+
+# Must match the indexed expression exactly for PostgreSQL to use the GIN index.
+PG_DOCUMENT = "to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, ''))"
+PG_INDEX = 'store_product_search_idx'
+
+# Name matches outrank description matches in the SQLite ranking.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def install_search_index(schema_connection=None):
+    """
+    Create the full-text index for the current database if it is missing.
+    Safe to call repeatedly; SQLite triggers are recreated (and the index
+    rebuilt) whenever a table rebuild during a migration has dropped them.
+    """
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'store_product'"
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+                "name, description, content='store_product', content_rowid='id', "
+                "tokenize='porter unicode61')"
+            )
+            if not SQLITE_TRIGGERS.keys() <= existing:
+                for sql in SQLITE_TRIGGERS.values():
+                    cursor.execute(sql)
+                cursor.execute(f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}) VALUES ('rebuild')")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON store_product USING GIN ({PG_DOCUMENT})"
+            )
+
+
+def drop_search_index(schema_connection=None):
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+
+
+def _fts_query(terms):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+    Quoting each token keeps user input from being parsed as FTS syntax.
+    """
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_product_ids(query, limit=50, active_only=True):
+    """
+    Return product ids matching `query`, best match first.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return []
+
+    active = ' AND p.is_active' if active_only else ''
+    if connection.vendor == 'sqlite':
+        sql = (
+            f'SELECT p.id FROM {SQLITE_TABLE} f JOIN store_product p ON p.id = f.rowid '
+            f'WHERE {SQLITE_TABLE} MATCH %s{active} '
+            f'ORDER BY bm25({SQLITE_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) LIMIT %s'
+        )
+        params = [_fts_query(terms), limit]
+    elif connection.vendor == 'postgresql':
+        sql = (
+            f"SELECT p.id FROM store_product p, websearch_to_tsquery('english', %s) q "
+            f'WHERE {PG_DOCUMENT} @@ q{active} '
+            f'ORDER BY ts_rank({PG_DOCUMENT}, q) DESC, p.id LIMIT %s'
+        )
+        params = [' '.join(terms), limit]
+    else:
+        matches = Product.objects.all()
+        if active_only:
+            matches = matches.filter(is_active=True)
+        for term in terms:
+            matches = matches.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return list(matches.values_list('id', flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_products(query, limit=50):
+    """
+    Return active products matching `query` as a ranked list.
+    """
+    ids = search_product_ids(query, limit=limit)
+    products = Product.objects.select_related('category').in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
@@ -0,0 +1,105 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .cart import merge_cart_data
+from .cart_storage import DatabaseCartStorage, get_cart_storage
+from .catalog import invalidate_categories, bump_catalog_version, bump_category_list_version
+from .models import Product, ProductCategory, ProductReview, Order
+from .purchases import invalidate_purchases
+from .ratings import apply_rating_change
+from .snapshots import invalidate_snapshots
+
+
+@receiver(post_init, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    # Read the raw value so deferred fields are not loaded one query per row
+    instance._listed_in = instance.__dict__.get('category_id')
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_snapshot(sender, instance, **kwargs):
+    """
+    Drop the cached cart snapshot and mark the product's listings as
+    changed whenever a product changes. Deferred to commit so a concurrent
+    reader cannot re-cache the old row.
+    """
+    product_id = instance.pk
+    category_ids = (instance._listed_in, instance.category_id)
+    instance._listed_in = instance.category_id
+
+    def invalidate():
+        invalidate_snapshots([product_id])
+        bump_catalog_version(*category_ids)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=ProductCategory)
+def invalidate_category_list(sender, instance, **kwargs):
+    """
+    Refresh the cached category list used by the catalog.
+    """
+    transaction.on_commit(invalidate_categories)
+    transaction.on_commit(bump_category_list_version)
+
+
+@receiver(post_init, sender=ProductReview)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._rated = (instance.product_id, instance.rating)
+
+
+@receiver(post_save, sender=ProductReview)
+def update_product_rating(sender, instance, created, **kwargs):
+    """
+    Keep the product's rating aggregates in step with its reviews.
+    """
+    old_product_id, old_rating = instance._rated
+    if created:
+        apply_rating_change(instance.product_id, added=instance.rating)
+    elif old_product_id != instance.product_id:
+        apply_rating_change(old_product_id, removed=old_rating)
+        apply_rating_change(instance.product_id, added=instance.rating)
+    else:
+        apply_rating_change(instance.product_id, added=instance.rating, removed=old_rating)
+    instance._rated = (instance.product_id, instance.rating)
+    bump_rated_listings({old_product_id, instance.product_id})
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_product_rating(sender, instance, **kwargs):
+    apply_rating_change(instance.product_id, removed=instance._rated[1])
+    bump_rated_listings({instance.product_id})
+
+
+def bump_rated_listings(product_ids):
+    """
+    Listings show ratings and can sort by them, so mark them changed.
+    """
+    category_ids = list(
+        Product.objects.filter(id__in=product_ids).values_list('category_id', flat=True)
+    )
+    transaction.on_commit(lambda: bump_catalog_version(*category_ids))
+
+
+@receiver([post_save, post_delete], sender=Order)
+def refresh_purchases(sender, instance, **kwargs):
+    """
+    Recompute the user's purchased products once the order (and its items)
+    is committed.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_purchases(user_id))
+
+
+@receiver(user_logged_in)
+def claim_anonymous_cart(sender, request, user, **kwargs):
+    """
+    Keep what a visitor put in their cart before signing in. Session and
+    cookie carts follow the browser already; database carts are keyed by
+    user, so the anonymous one is merged in.
+    """
+    storage = get_cart_storage(request)
+    if isinstance(storage, DatabaseCartStorage):
+        storage.claim_anonymous_cart(user, merge_cart_data)
@@ -0,0 +1,135 @@
+# store/snapshots.py
+
+import threading
+from collections import Counter
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from store.models import Product
+
+# Bump when the snapshot layout changes so stale entries are never read back.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class ProductSnapshot:
+    """
+    Lightweight, cacheable copy of the product fields needed by the cart
+    and checkout.
+    """
+    __slots__ = ('id', 'name', 'slug', 'price', 'stock', 'image_url', 'is_active')
+
+    def __init__(self, id, name, slug, price, stock, image_url, is_active):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.price = price
+        self.stock = stock
+        self.image_url = image_url
+        self.is_active = is_active
+
+    @classmethod
+    def from_product(cls, product):
+        return cls(
+            id=product.id,
+            name=product.name,
+            slug=product.slug,
+            price=product.price,
+            stock=product.stock,
+            image_url=product.image.url if product.image else '',
+            is_active=product.is_active,
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'slug': self.slug,
+            'price': str(self.price),
+            'stock': self.stock,
+            'image_url': self.image_url,
+            'is_active': self.is_active,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data, price=Decimal(data['price']))
+        return cls(**data)
+
+    def __str__(self):
+        return self.name
+
+
+def _key(product_id):
+    return f'store:product-snapshot:{product_id}'
+
+
+def _record(hits, misses):
+    with _stats_lock:
+        _stats['hits'] += hits
+        _stats['misses'] += misses
+
+
+def get_snapshots(product_ids):
+    """
+    Return a dict of product id -> ProductSnapshot, reading from the cache
+    and loading only the missing products from the database.
+    """
+    product_ids = {int(pid) for pid in product_ids}
+    if not product_ids:
+        return {}
+
+    keys = {_key(pid): pid for pid in product_ids}
+    cached = cache.get_many(keys.keys(), version=SNAPSHOT_VERSION)
+    snapshots = {
+        keys[key]: ProductSnapshot.from_dict(data)
+        for key, data in cached.items()
+    }
+
+    missing = product_ids - snapshots.keys()
+    _record(len(snapshots), len(missing))
+
+    if missing:
+        fresh = {
+            product.id: ProductSnapshot.from_product(product)
+            for product in Product.objects.filter(id__in=missing)
+        }
+        cache.set_many(
+            {_key(pid): snapshot.to_dict() for pid, snapshot in fresh.items()},
+            timeout=SNAPSHOT_TIMEOUT,
+            version=SNAPSHOT_VERSION,
+        )
+        snapshots.update(fresh)
+
+    return snapshots
+
+
+def get_snapshot(product_id):
+    """
+    Return the ProductSnapshot for a single product, or None if it does not exist.
+    """
+    return get_snapshots([product_id]).get(int(product_id))
+
+
+def invalidate_snapshots(product_ids):
+    """
+    Drop cached snapshots so the next read reloads them from the database.
+    """
+    cache.delete_many([_key(pid) for pid in product_ids], version=SNAPSHOT_VERSION)
+
+
+def snapshot_stats():
+    """
+    Return the hit/miss counters for this process.
+    """
+    with _stats_lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses']}
+
+
+def reset_snapshot_stats():
+    with _stats_lock:
+        _stats.clear()
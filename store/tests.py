@@ -1,3 +1,773 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import StripeEvent
+from core.webhooks import process_pending_events
+from .admin import OrderAdmin
+from .cart import decode
+from .importer import ProductImporter, read_rows
+from .models import (
+    ProductCategory, Product, ProductReview, Order, OrderItem, PendingCheckout, StockReservation, StoredCart,
+)
+from .ratings import rebuild_ratings
+from .reservations import (
+    InsufficientStock, RESERVATION_GRACE, purge_abandoned_checkouts, release_expired_reservations,
+    reservation_ttl, reserve_stock,
+)
+from .snapshots import get_snapshot
+from .views import expire_checkout, fulfill_order
+
+
+class OrderHistoryQueryBudgetTests(TestCase):
+    """
+    Order pages must cost the same number of queries however many orders
+    or items there are.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.products = [
+            Product.objects.create(
+                category=category,
+                name=f'Kettlebell {i}',
+                slug=f'kettlebell-{i}',
+                description='Cast iron',
+                price=Decimal('20.00'),
+                image='products/kettlebell.jpg',
+                stock=100,
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_order(self, item_count=1):
+        order = Order.objects.create(
+            user=self.user,
+            total=Decimal('20.00') * item_count,
+            is_paid=True,
+            item_count=item_count,
+            thumbnail=self.products[0].image.name,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.products[i % len(self.products)], quantity=1, price=Decimal('20.00'))
+            for i in range(item_count)
+        ])
+        return order
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_order()
+        baseline = self.count_queries(reverse('store:orders'))
+
+        for _ in range(15):
+            self.create_order(item_count=3)
+        self.assertEqual(self.count_queries(reverse('store:orders')), baseline)
+
+    def test_order_detail_query_count_is_constant(self):
+        small = self.create_order(item_count=1)
+        baseline = self.count_queries(reverse('store:order_detail', args=[small.id]))
+
+        large = self.create_order(item_count=5)
+        self.assertEqual(
+            self.count_queries(reverse('store:order_detail', args=[large.id])),
+            baseline,
+        )
+
+    def test_order_list_is_paginated(self):
+        for _ in range(25):
+            self.create_order()
+
+        response = self.client.get(reverse('store:orders'))
+        self.assertEqual(len(response.context['orders']), 20)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        response = self.client.get(reverse('store:orders'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(len(response.context['orders']), 5)
+        self.assertIsNone(response.context['next_cursor'])
+
+
+class ProductSearchViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ProductCategory.objects.create(name='Equipment')
+
+        def product(name, description, is_active=True):
+            return Product.objects.create(
+                category=category,
+                name=name,
+                slug=name.lower().replace(' ', '-'),
+                description=description,
+                price=Decimal('20.00'),
+                image='products/item.jpg',
+                stock=10,
+                is_active=is_active,
+            )
+
+        cls.described = product('Gym Bag', 'Fits a kettlebell and shoes')
+        cls.named = product('Kettlebell', 'Cast iron')
+        product('Old Kettlebell', 'Retired', is_active=False)
+        product('Yoga Mat', 'Non-slip')
+
+    def test_results_are_ranked_with_name_matches_first(self):
+        response = self.client.get(reverse('store:search'), {'q': 'kettle'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'store/search.html')
+        self.assertEqual(list(response.context['products']), [self.named, self.described])
+        self.assertContains(response, reverse('store:product_detail', args=[self.named.id, self.named.slug]))
+
+    def test_empty_query_renders_without_results(self):
+        response = self.client.get(reverse('store:search'), {'q': '  '})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['products'], [])
+
+
+class FulfillOrderFailureTests(TestCase):
+    """
+    A paid checkout that cannot be fulfilled is not dropped: the inbox
+    keeps retrying it and marks it failed once its attempts run out.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.product = Product.objects.create(
+            category=category,
+            name='Kettlebell',
+            slug='kettlebell',
+            description='Cast iron',
+            price=Decimal('20.00'),
+            image='products/kettlebell.jpg',
+            stock=1,
+        )
+
+    def create_event(self, session_id):
+        return StripeEvent.objects.create(
+            event_id=f'evt_{session_id}',
+            source='store',
+            event_type='checkout.session.completed',
+            payload={
+                'id': f'evt_{session_id}',
+                'object': 'event',
+                'type': 'checkout.session.completed',
+                'data': {'object': {'id': session_id, 'object': 'checkout.session', 'payment_intent': 'pi_1'}},
+            },
+        )
+
+    def test_insufficient_stock_is_retried_then_failed(self):
+        PendingCheckout.objects.create(
+            stripe_session_id='cs_1',
+            user=self.user,
+            lines=[[self.product.id, 2, '20.00']],
+            total=Decimal('40.00'),
+        )
+        inbox_event = self.create_event('cs_1')
+
+        self.assertEqual(process_pending_events(max_attempts=2), (0, 1))
+        inbox_event.refresh_from_db()
+        self.assertEqual(inbox_event.status, StripeEvent.PENDING)
+        self.assertIn('InsufficientStock', inbox_event.last_error)
+
+        StripeEvent.objects.filter(pk=inbox_event.pk).update(next_attempt_on=timezone.now())
+        self.assertEqual(process_pending_events(max_attempts=2), (0, 1))
+        inbox_event.refresh_from_db()
+        self.assertEqual(inbox_event.status, StripeEvent.FAILED)
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+    def test_unknown_checkout_is_not_marked_processed(self):
+        inbox_event = self.create_event('cs_unknown')
+
+        self.assertEqual(process_pending_events(), (0, 1))
+        inbox_event.refresh_from_db()
+        self.assertEqual(inbox_event.status, StripeEvent.PENDING)
+        self.assertIn('DoesNotExist', inbox_event.last_error)
+
+
+class CatalogViewTests(TestCase):
+    """
+    Catalog pages are keyset-paginated, sortable and validated with ETags;
+    anonymous pages are public unless they embed a CSRF token.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.products = [
+            Product.objects.create(
+                category=category,
+                name=f'Plate {i}',
+                slug=f'plate-{i}',
+                description='Bumper plate',
+                price=Decimal(10 + i),
+                image='products/plate.jpg',
+                stock=5,
+            )
+            for i in range(30)
+        ]
+
+    def test_pages_follow_the_cursor(self):
+        response = self.client.get(reverse('store:products'), {'sort': 'price'})
+        self.assertTemplateUsed(response, 'store/products.html')
+        first_page = list(response.context['products'])
+        self.assertEqual(first_page, self.products[:24])
+
+        response = self.client.get(
+            reverse('store:products'), {'sort': 'price', 'cursor': response.context['next_cursor']}
+        )
+        self.assertEqual(list(response.context['products']), self.products[24:])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_sort_by_price_descending(self):
+        response = self.client.get(reverse('store:products'), {'sort': '-price'})
+        self.assertEqual(response.context['sort'], '-price')
+        self.assertEqual(list(response.context['products']), self.products[::-1][:24])
+
+    def test_unknown_sort_falls_back_to_newest(self):
+        response = self.client.get(reverse('store:products'), {'sort': 'name'})
+        self.assertEqual(response.context['sort'], 'newest')
+
+    def test_unchanged_listing_is_not_modified(self):
+        response = self.client.get(reverse('store:products'))
+        self.assertIn('public', response['Cache-Control'])
+
+        response = self.client.get(reverse('store:products'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_listing_changes_when_a_product_does(self):
+        etag = self.client.get(reverse('store:products'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+
+        response = self.client.get(reverse('store:products'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_page_with_a_csrf_token_is_private(self):
+        product = self.products[0]
+        response = self.client.get(reverse('store:product_detail', args=[product.id, product.slug]))
+        self.assertTemplateUsed(response, 'store/product_detail.html')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+    def test_signed_in_pages_are_private(self):
+        user = User.objects.create_user(username='member', password='pass12345')
+        self.client.force_login(user)
+        response = self.client.get(reverse('store:products'))
+        self.assertIn('private', response['Cache-Control'])
+
+
+class StockReservationTests(TestCase):
+    """
+    Checkout holds stock until the order is paid, canceled or expires, and
+    fulfillment never takes the same stock twice.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.product = Product.objects.create(
+            category=category,
+            name='Kettlebell',
+            slug='kettlebell',
+            description='Cast iron',
+            price=Decimal('20.00'),
+            image='products/kettlebell.jpg',
+            stock=5,
+        )
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def create_checkout(self, quantity=2):
+        reference = reserve_stock({self.product.id: quantity})
+        return PendingCheckout.objects.create(
+            stripe_session_id='cs_1',
+            user=self.user,
+            lines=[[self.product.id, quantity, '20.00']],
+            total=Decimal('20.00') * quantity,
+            reservation=reference,
+        )
+
+    def reservation_status(self, reference):
+        return StockReservation.objects.get(reference=reference).status
+
+    @mock.patch('store.views.create_checkout_session')
+    def test_checkout_reserves_stock(self, create_checkout_session):
+        create_checkout_session.return_value = SimpleNamespace(id='cs_1', url='https://checkout.stripe.test/cs_1')
+        self.client.force_login(self.user)
+        self.client.post(reverse('store:add_to_cart', args=[self.product.id]), {'quantity': 2})
+
+        response = self.client.post(reverse('store:checkout'))
+        self.assertRedirects(response, 'https://checkout.stripe.test/cs_1', fetch_redirect_response=False)
+        self.assertEqual(self.stock(), 3)
+        pending = PendingCheckout.objects.get(stripe_session_id='cs_1')
+        self.assertEqual(self.reservation_status(pending.reservation), StockReservation.PENDING)
+        self.assertEqual(self.client.session['stock_reservation'], pending.reservation)
+
+    def test_fulfillment_confirms_the_reservation(self):
+        pending = self.create_checkout()
+        order = fulfill_order('cs_1', 'pi_1')
+
+        self.assertEqual(order.item_count, 2)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(self.reservation_status(pending.reservation), StockReservation.CONFIRMED)
+        # A redelivered webhook returns the same order
+        self.assertEqual(fulfill_order('cs_1', 'pi_1'), order)
+        self.assertEqual(self.stock(), 3)
+
+    def test_cancel_releases_the_reservation(self):
+        pending = self.create_checkout()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['stock_reservation'] = pending.reservation
+        session.save()
+
+        self.client.get(reverse('store:order_cancel'))
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(self.reservation_status(pending.reservation), StockReservation.RELEASED)
+
+    def test_expired_session_releases_the_reservation(self):
+        pending = self.create_checkout()
+        expire_checkout('cs_1')
+
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(self.reservation_status(pending.reservation), StockReservation.RELEASED)
+        self.assertFalse(PendingCheckout.objects.exists())
+
+    def test_sweeper_releases_expired_reservations_once(self):
+        pending = self.create_checkout()
+        expiry = timezone.now() + reservation_ttl() + RESERVATION_GRACE
+
+        self.assertEqual(release_expired_reservations(now=expiry - timedelta(minutes=1)), 0)
+        self.assertEqual(self.stock(), 3)
+
+        self.assertEqual(release_expired_reservations(now=expiry + timedelta(minutes=1)), 1)
+        self.assertEqual(release_expired_reservations(now=expiry + timedelta(minutes=1)), 0)
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(self.reservation_status(pending.reservation), StockReservation.RELEASED)
+
+    def test_lapsed_reservation_falls_back_to_a_conditional_decrement(self):
+        self.create_checkout()
+        release_expired_reservations(now=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.stock(), 5)
+
+        fulfill_order('cs_1', 'pi_1')
+        self.assertEqual(self.stock(), 3)
+
+    def test_lapsed_reservation_without_stock_is_not_fulfilled(self):
+        self.create_checkout(quantity=4)
+        release_expired_reservations(now=timezone.now() + timedelta(days=1))
+        Product.objects.filter(id=self.product.id).update(stock=1)
+
+        with self.assertRaises(InsufficientStock):
+            fulfill_order('cs_1', 'pi_1')
+        self.assertEqual(self.stock(), 1)
+        self.assertFalse(Order.objects.exists())
+
+
+class ProductImportTests(TestCase):
+    """
+    Feed rows with a name, price and category upsert products; partial rows
+    update only the columns they carry on products that already exist.
+    """
+
+    def import_csv(self, text):
+        importer = ProductImporter(batch_size=2)
+        importer.run(read_rows(StringIO(text), 'csv'))
+        return importer
+
+    def create_products(self):
+        return self.import_csv(
+            'slug,name,category,description,price,stock\n'
+            'kettlebell,Kettlebell,Equipment,Cast iron,20,5\n'
+            ',Yoga Mat,Accessories,Non-slip,15.5,8\n'
+            'rope,Jump Rope,Accessories,,7,3\n'
+        )
+
+    def test_creates_products_and_categories(self):
+        importer = self.create_products()
+
+        self.assertEqual(importer.upserted, 3)
+        mat = Product.objects.get(slug='yoga-mat')
+        self.assertEqual((mat.price, mat.stock, mat.category.name), (Decimal('15.50'), 8, 'Accessories'))
+        self.assertEqual(Product.objects.get(slug='rope').description, '')
+        self.assertEqual(ProductCategory.objects.count(), 2)
+
+    def test_partial_rows_update_only_their_columns(self):
+        self.create_products()
+        importer = self.import_csv(
+            'slug,description,price,stock\n'
+            'kettlebell,,22,\n'
+            'missing,,1,1\n'
+        )
+
+        self.assertEqual((importer.updated, importer.skipped), (1, 1))
+        kettlebell = Product.objects.get(slug='kettlebell')
+        self.assertEqual(kettlebell.price, Decimal('22.00'))
+        self.assertEqual(kettlebell.stock, 5)
+        self.assertEqual(kettlebell.description, 'Cast iron')
+
+    def test_invalid_rows_are_reported(self):
+        importer = self.import_csv(
+            'slug,name,category,price,stock\n'
+            'a,A,Equipment,abc,1\n'
+            'b,B,Equipment,1,-2\n'
+            'c,C,Equipment,1,1\n'
+        )
+
+        self.assertEqual(importer.error_count, 2)
+        self.assertEqual([number for number, _ in importer.errors], [1, 2])
+        self.assertEqual(importer.upserted, 1)
+
+    def test_stock_excludes_units_held_by_pending_checkouts(self):
+        self.create_products()
+        kettlebell = Product.objects.get(slug='kettlebell')
+        reserve_stock({kettlebell.id: 2})
+
+        self.import_csv('slug,stock\nkettlebell,10\n')
+        kettlebell.refresh_from_db()
+        self.assertEqual(kettlebell.stock, 8)
+
+    def test_command_reads_json_lines(self):
+        out, err = StringIO(), StringIO()
+        with mock.patch('sys.stdin', StringIO(
+            '{"name": "Kettlebell", "category": "Equipment", "price": "20", "stock": 5}\n'
+            'not json\n'
+        )):
+            call_command('import_products', '-', format='jsonl', stdout=out, stderr=err)
+
+        self.assertEqual(Product.objects.get(slug='kettlebell').stock, 5)
+        self.assertIn('1 created or replaced', out.getvalue())
+        self.assertIn('1 invalid', out.getvalue())
+        self.assertIn('Row 2: not a JSON object', err.getvalue())
+
+
+class CartStorageTests(TestCase):
+    """
+    The cart is written once per request to the configured storage, and a
+    database cart filled before signing in is merged into the user's.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.products = [
+            Product.objects.create(
+                category=category,
+                name=f'Kettlebell {i}',
+                slug=f'kettlebell-{i}',
+                description='Cast iron',
+                price=Decimal('20.00'),
+                image='products/kettlebell.jpg',
+                stock=100,
+            )
+            for i in range(3)
+        ]
+
+    def add_to_cart(self, product, quantity=1):
+        return self.client.post(reverse('store:add_to_cart', args=[product.id]), {'quantity': quantity})
+
+    def test_session_storage(self):
+        self.client.force_login(self.user)
+        self.add_to_cart(self.products[0], 2)
+        self.add_to_cart(self.products[0])
+
+        self.assertEqual(decode(self.client.session[settings.CART_SESSION_ID]), {self.products[0].id: [3, 2000]})
+        self.assertFalse(StoredCart.objects.exists())
+        response = self.client.get(reverse('store:cart'))
+        self.assertContains(response, 'Kettlebell 0')
+        self.assertEqual(response.context['cart'].get_total_price(), Decimal('60.00'))
+
+    @override_settings(CART_STORAGE='store.cart_storage.DatabaseCartStorage')
+    def test_database_storage(self):
+        self.client.force_login(self.user)
+        self.add_to_cart(self.products[0], 2)
+
+        stored = StoredCart.objects.get(key=f'user:{self.user.id}')
+        self.assertEqual(decode(stored.data), {self.products[0].id: [2, 2000]})
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+        self.client.get(reverse('store:remove_from_cart', args=[self.products[0].id]))
+        self.assertFalse(StoredCart.objects.exists())
+
+    @override_settings(CART_STORAGE='store.cart_storage.DatabaseCartStorage')
+    def test_anonymous_database_cart_is_merged_at_login(self):
+        def cart_data(*lines):
+            return {'v': 1, 'ids': [p.id for p, _ in lines], 'qty': [q for _, q in lines], 'cents': [2000] * len(lines)}
+
+        StoredCart.objects.create(key=f'user:{self.user.id}', data=cart_data((self.products[0], 1)))
+        StoredCart.objects.create(key='session:visitor', data=cart_data((self.products[0], 2), (self.products[1], 1)))
+        session = self.client.session
+        session['cart_token'] = 'visitor'
+        session.save()
+
+        self.client.login(username='member', password='pass12345')
+        stored = StoredCart.objects.get()
+        self.assertEqual(stored.key, f'user:{self.user.id}')
+        self.assertEqual(decode(stored.data), {self.products[0].id: [3, 2000], self.products[1].id: [1, 2000]})
+        self.assertNotIn('cart_token', self.client.session)
+
+    @override_settings(CART_STORAGE='store.cart_storage.SignedCookieCartStorage')
+    def test_signed_cookie_storage(self):
+        self.client.force_login(self.user)
+        self.add_to_cart(self.products[1])
+
+        self.assertIn('cart', self.client.cookies)
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+        response = self.client.get(reverse('store:cart'))
+        self.assertEqual(len(response.context['cart']), 1)
+
+    def test_cart_is_written_once_per_request(self):
+        self.client.force_login(self.user)
+        with mock.patch('store.cart_storage.SessionCartStorage.save') as save:
+            self.add_to_cart(self.products[0])
+            self.client.get(reverse('store:cart'))
+        self.assertEqual(save.call_count, 1)
+
+
+class CartSnapshotQueryTests(TestCase):
+    """
+    Reading the cart loads missing product snapshots with one query, and
+    none once they are cached, however many products it holds.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.products = [
+            Product.objects.create(
+                category=category,
+                name=f'Kettlebell {i}',
+                slug=f'kettlebell-{i}',
+                description='Cast iron',
+                price=Decimal('20.00'),
+                image='products/kettlebell.jpg',
+                stock=100,
+            )
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def fill_cart(self, products):
+        session = self.client.session
+        session[settings.CART_SESSION_ID] = {
+            'v': 1,
+            'ids': [product.id for product in products],
+            'qty': [1] * len(products),
+            'cents': [2000] * len(products),
+        }
+        session.save()
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('store:cart'))
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_cart_page_query_count_is_constant(self):
+        self.fill_cart(self.products[:1])
+        baseline = self.count_queries()
+
+        cache.clear()
+        self.fill_cart(self.products)
+        self.assertEqual(self.count_queries(), baseline)
+
+    def test_cached_snapshots_cost_no_query(self):
+        self.fill_cart(self.products)
+        uncached = self.count_queries()
+        self.assertEqual(self.count_queries(), uncached - 1)
+
+
+class SnapshotInvalidationTests(TestCase):
+    """
+    Stock changes drop cached snapshots only once they are committed, so a
+    concurrent read cannot cache the old stock again.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.product = Product.objects.create(
+            category=category,
+            name='Kettlebell',
+            slug='kettlebell',
+            description='Cast iron',
+            price=Decimal('20.00'),
+            image='products/kettlebell.jpg',
+            stock=5,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def create_checkout(self, session_id='cs_1'):
+        return PendingCheckout.objects.create(
+            stripe_session_id=session_id,
+            user=self.user,
+            lines=[[self.product.id, 2, '20.00']],
+            total=Decimal('40.00'),
+        )
+
+    def test_fulfillment_in_an_outer_transaction_invalidates_after_commit(self):
+        self.create_checkout()
+        self.assertEqual(get_snapshot(self.product.id).stock, 5)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                fulfill_order('cs_1', 'pi_1')
+                self.assertEqual(get_snapshot(self.product.id).stock, 5)
+        self.assertEqual(get_snapshot(self.product.id).stock, 5)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_snapshot(self.product.id).stock, 3)
+
+    def test_purge_keeps_checkouts_with_an_order(self):
+        fulfilled = self.create_checkout('cs_paid')
+        fulfill_order('cs_paid', 'pi_1')
+        abandoned = self.create_checkout('cs_abandoned')
+        recent = self.create_checkout('cs_recent')
+        PendingCheckout.objects.filter(id__in=[fulfilled.id, abandoned.id]).update(
+            created_on=timezone.now() - timedelta(days=2)
+        )
+
+        self.assertEqual(purge_abandoned_checkouts(), 1)
+        self.assertQuerySetEqual(
+            PendingCheckout.objects.order_by('id'), [fulfilled, recent]
+        )
+        self.assertTrue(Order.objects.filter(checkout=fulfilled).exists())
+
+
+class ProductRatingTests(TestCase):
+    """
+    Review changes keep the product's rating average, sum and per-star
+    counts in step, matching a rebuild from the reviews.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'member{i}', password='pass12345') for i in range(3)]
+        category = ProductCategory.objects.create(name='Equipment')
+        cls.product = Product.objects.create(
+            category=category,
+            name='Kettlebell',
+            slug='kettlebell',
+            description='Cast iron',
+            price=Decimal('20.00'),
+            image='products/kettlebell.jpg',
+            stock=5,
+        )
+
+    def review(self, user, rating):
+        return ProductReview.objects.create(product=self.product, user=user, rating=rating, review='Solid')
+
+    def assertRatings(self, avg, total, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_avg, Decimal(avg))
+        self.assertEqual(self.product.rating_sum, total)
+        self.assertEqual(self.product.rating_count, sum(histogram.values()))
+        self.assertEqual(dict(self.product.rating_histogram), {star: histogram.get(star, 0) for star in range(1, 6)})
+
+    def test_create(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 4)
+        self.review(self.users[2], 4)
+        self.assertRatings('4.33', 13, {5: 1, 4: 2})
+
+    def test_update(self):
+        review = self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+
+        review.rating = 3
+        review.save()
+        self.assertRatings('2.50', 5, {3: 1, 2: 1})
+
+        review.review = 'Still solid'
+        review.save()
+        self.assertRatings('2.50', 5, {3: 1, 2: 1})
+
+    def test_delete(self):
+        first = self.review(self.users[0], 5)
+        second = self.review(self.users[1], 1)
+
+        first.delete()
+        self.assertRatings('1.00', 1, {1: 1})
+        second.delete()
+        self.assertRatings('0', 0, {})
+
+    def test_rebuild_matches(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 2).delete()
+        self.review(self.users[2], 4)
+        Product.objects.filter(id=self.product.id).update(rating_avg=0, rating_sum=0, rating_count=0, rating_5=0)
+
+        rebuild_ratings([self.product.id])
+        self.assertRatings('4.50', 9, {5: 1, 4: 1})
+
+
+class OrderAdminSearchTests(TestCase):
+    """
+    The order changelist searches by exact order number, username or
+    email, the email ignoring case and served by its LOWER(email) index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', email='Member@Example.com', password='pass12345')
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass12345')
+        cls.order = Order.objects.create(user=cls.user, total=Decimal('20.00'), is_paid=True)
+        cls.other_order = Order.objects.create(user=other, total=Decimal('20.00'), is_paid=True)
+
+    def search(self, term):
+        admin = OrderAdmin(Order, AdminSite())
+        queryset, may_have_duplicates = admin.get_search_results(None, Order.objects.all(), term)
+        self.assertFalse(may_have_duplicates)
+        return list(queryset)
+
+    def test_search_by_email_ignores_case(self):
+        self.assertEqual(self.search('member@example.com'), [self.order])
+        self.assertEqual(self.search(' MEMBER@EXAMPLE.COM '), [self.order])
+
+    def test_search_by_username_or_order_number(self):
+        self.assertEqual(self.search('member'), [self.order])
+        self.assertEqual(self.search(f'#{self.other_order.id}'), [self.other_order])
+        self.assertEqual(self.search('member@example'), [])
+
+    def test_email_index_exists(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, User._meta.db_table)
+        self.assertIn('core_user_email_lower_idx', constraints)
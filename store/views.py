@@ -1,54 +1,146 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponse
-
-import stripe
-import json
+from django.http import Http404
+from django.db import models, transaction
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+import logging
+from datetime import timedelta
 from decimal import Decimal
 
-from .models import Product, ProductCategory, Order, OrderItem
+from .models import Product, Order, OrderItem, PendingCheckout
 from .forms import AddToCartForm
 from .cart import Cart
+from .search import search_products
+from .purchases import has_purchased
+from .reservations import (
+    InsufficientStock, reserve_stock, confirm_reservation, release_reservation, reservation_ttl,
+)
+from .snapshots import invalidate_snapshots
+from .sales import record_sale
+from .catalog import (
+    get_categories, get_category, listing_version, version_datetime, SORT_ORDERINGS, DEFAULT_SORT,
+)
+from core.conditional import public_condition
+from core.pagination import keyset_paginate
+from core.stripe_gateway import create_checkout_session
+from core.webhooks import receive_stripe_event
+
+logger = logging.getLogger(__name__)
+
+STRIPE_MIN_SESSION = timedelta(minutes=30)
+
+
+PRODUCTS_PER_PAGE = 24
+ORDERS_PER_PAGE = 20
+
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+def _listing_version(request, category_slug=None):
+    if not hasattr(request, '_listing_version'):
+        category = get_category(category_slug) if category_slug else None
+        if category_slug and category is None:
+            request._listing_version = None  # The view raises 404
+        else:
+            request._listing_version = listing_version(category.id if category else None)
+    return request._listing_version
 
 
+def listing_etag(request, category_slug=None):
+    version = _listing_version(request, category_slug)
+    return version and f'products-{category_slug or "all"}-{version}'
+
+
+def listing_last_modified(request, category_slug=None):
+    version = _listing_version(request, category_slug)
+    return version and version_datetime(version)
+
+
+@public_condition(etag_func=listing_etag, last_modified_func=listing_last_modified)
 def products(request, category_slug=None):
     """
     Display list of active products, optionally filtered by category.
+    Pages are keyset-paginated with an opaque ?cursor= so page N costs the
+    same as page 1, and ?sort= selects newest, price or -price.
+    Validated by the category's listing version, which changes when one of
+    its products, its ratings or the category list changes; stock levels
+    are only shown on the product page.
     """
     category = None
-    categories = ProductCategory.objects.all()
-    product_list = Product.objects.filter(is_active=True)
+    categories = get_categories()
+    product_list = Product.objects.filter(is_active=True).select_related('category')
 
     if category_slug:
-        category = get_object_or_404(ProductCategory, slug=category_slug)
+        category = get_category(category_slug)
+        if category is None:
+            raise Http404('No category matches the given query.')
         product_list = product_list.filter(category=category)
 
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in SORT_ORDERINGS:
+        sort = DEFAULT_SORT
+
+    page = keyset_paginate(
+        product_list,
+        SORT_ORDERINGS[sort],
+        cursor=request.GET.get('cursor'),
+        page_size=PRODUCTS_PER_PAGE,
+    )
+
     return render(request, 'store/products.html', {
         'category': category,
         'categories': categories,
-        'products': product_list
+        'products': page,
+        'sort': sort,
+        'next_cursor': page.next_cursor,
     })
 
 
+def search(request):
+    """
+    Display active products matching the ?q= search terms, best match first.
+    """
+    query = request.GET.get('q', '').strip()
+    results = search_products(query) if query else []
+
+    return render(request, 'store/search.html', {
+        'query': query,
+        'products': results,
+    })
+
+
+def _product_updated_on(request, id, slug):
+    if not hasattr(request, '_product_updated_on'):
+        request._product_updated_on = (
+            Product.objects.filter(id=id, slug=slug, is_active=True)
+            .values_list('updated_on', flat=True).first()
+        )
+    return request._product_updated_on
+
+
+def product_etag(request, id, slug):
+    updated_on = _product_updated_on(request, id, slug)
+    return updated_on and f'product-{id}-{updated_on.timestamp():.6f}'
+
+
+def product_last_modified(request, id, slug):
+    return _product_updated_on(request, id, slug)
+
+
+@public_condition(etag_func=product_etag, last_modified_func=product_last_modified)
 def product_detail(request, id, slug):
     """
     Display product detail page, including reviews and cart form.
+    updated_on changes with the product's stock, rating and reviews, so it
+    validates the whole page.
     """
     product = get_object_or_404(Product, id=id, slug=slug, is_active=True)
-    reviews = product.productreview_set.all()
+    reviews = product.reviews.select_related('user').order_by('-created_on')
 
-    can_review = False
-    if request.user.is_authenticated:
-        can_review = OrderItem.objects.filter(
-            order__user=request.user,
-            order__is_paid=True,
-            product=product
-        ).exists()
+    can_review = has_purchased(request.user, product.id)
 
     return render(request, 'store/product_detail.html', {
         'product': product,
@@ -108,6 +200,16 @@ def checkout(request):
         return redirect('store:products')
 
     if request.method == 'POST':
+        items = list(cart)
+        if not items:
+            messages.warning(request, 'Your cart is empty.')
+            return redirect('store:products')
+        try:
+            reservation = reserve_stock({item['product'].id: item['quantity'] for item in items})
+        except InsufficientStock:
+            messages.error(request, 'Sorry, some items in your cart are no longer in stock.')
+            return redirect('store:cart')
+
         try:
             line_items = [{
                 'price_data': {
@@ -116,22 +218,32 @@ def checkout(request):
                     'unit_amount': int(item['price'] * 100),
                 },
                 'quantity': item['quantity'],
-            } for item in cart]
+            } for item in items]
 
-            checkout_session = stripe.checkout.Session.create(
+            checkout_session = create_checkout_session(
                 payment_method_types=['card'],
                 line_items=line_items,
                 mode='payment',
                 success_url=request.build_absolute_uri('/store/order/success/'),
                 cancel_url=request.build_absolute_uri('/store/order/cancel/'),
+                # Stripe does not accept sessions shorter than 30 minutes
+                expires_at=int((timezone.now() + max(reservation_ttl(), STRIPE_MIN_SESSION)).timestamp()),
                 metadata={
                     'user_id': request.user.id,
-                    'cart': json.dumps(cart.cart)
                 }
             )
+            PendingCheckout.objects.create(
+                stripe_session_id=checkout_session.id,
+                user=request.user,
+                lines=[[item['product'].id, item['quantity'], str(item['price'])] for item in items],
+                total=sum(item['total_price'] for item in items),
+                reservation=reservation,
+            )
+            request.session['stock_reservation'] = reservation
             return redirect(checkout_session.url)
 
         except Exception:
+            release_reservation(reservation)
             messages.error(request, 'There was an error processing your payment.')
             return redirect('store:cart')
 
@@ -144,6 +256,7 @@ def order_success(request):
     Handle successful checkout.
     """
     Cart(request).clear()
+    request.session.pop('stock_reservation', None)
     messages.success(request, 'Your order was successful!')
     return redirect('store:orders')
 
@@ -153,6 +266,9 @@ def order_cancel(request):
     """
     Handle canceled checkout.
     """
+    reservation = request.session.pop('stock_reservation', None)
+    if reservation:
+        release_reservation(reservation)
     messages.info(request, 'Your order was canceled.')
     return redirect('store:cart')
 
@@ -160,10 +276,19 @@ def order_cancel(request):
 @login_required
 def orders(request):
     """
-    Show all orders made by the current user.
+    Show the current user's orders, newest first, one page at a time.
+    Item counts and thumbnails come from the order row itself.
     """
-    user_orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'store/orders.html', {'orders': user_orders})
+    page = keyset_paginate(
+        Order.objects.filter(user=request.user),
+        ('-created_on', '-id'),
+        cursor=request.GET.get('cursor'),
+        page_size=ORDERS_PER_PAGE,
+    )
+    return render(request, 'store/orders.html', {
+        'orders': page,
+        'next_cursor': page.next_cursor,
+    })
 
 
 @login_required
@@ -171,67 +296,120 @@ def order_detail(request, order_id):
     """
     Show details of a specific order.
     """
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(
+        Order.objects.prefetch_related('items__product'),
+        id=order_id,
+        user=request.user,
+    )
     return render(request, 'store/order_detail.html', {'order': order})
 
 
 @csrf_exempt
 def stripe_webhook(request):
     """
-    Handle Stripe webhook for completed checkout sessions.
+    Receive Stripe webhooks; see core.webhooks for the inbox mode.
     """
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
+    return receive_stripe_event(request, 'store')
 
-    try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
-    except (ValueError, stripe.error.SignatureVerificationError):
-        return HttpResponse(status=400)
 
+def handle_stripe_event(event):
+    """
+    Handle Stripe webhook for completed and expired checkout sessions.
+    """
+    session = event['data']['object']
     if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        fulfill_order(
-            session.metadata['user_id'],
-            session.metadata['cart'],
-            session.payment_intent
-        )
+        fulfill_order(session.id, session.payment_intent)
+    elif event['type'] == 'checkout.session.expired':
+        expire_checkout(session.id)
 
-    return HttpResponse(status=200)
 
-
-def fulfill_order(user_id, cart_data, payment_intent):
+def expire_checkout(session_id):
     """
-    Create an order and order items after successful Stripe checkout.
+    Return the stock held for an abandoned checkout and drop its snapshot.
     """
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-
-    try:
-        user = User.objects.get(id=user_id)
-        cart = json.loads(cart_data)
+    pending = PendingCheckout.objects.filter(
+        stripe_session_id=session_id, order__isnull=True
+    ).first()
+    if pending is None:
+        return
+    if pending.reservation:
+        release_reservation(pending.reservation)
+    pending.delete()
 
-        total = sum(
-            Decimal(item['price']) * item['quantity']
-            for item in cart.values()
-        )
-
-        order = Order.objects.create(
-            user=user,
-            total=total,
-            is_paid=True,
-            stripe_payment_intent_id=payment_intent
-        )
 
-        for product_id, item in cart.items():
-            product = Product.objects.get(id=product_id)
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=item['quantity'],
-                price=item['price']
+def fulfill_order(session_id, payment_intent):
+    """
+    Create an order and order items after successful Stripe checkout, from
+    the priced lines saved when the checkout session was created.
+    Runs in a single transaction: the checkout snapshot is locked so a
+    redelivered webhook returns the existing order, products are loaded
+    with one query, items are bulk inserted, the stock reservation is
+    confirmed and the sale is added to the reporting rollups, so either
+    the whole order is written or nothing is. Without a held reservation,
+    stock is decremented with one conditional update.
+    A checkout that cannot be fulfilled raises, so the webhook is retried
+    (and the inbox marks the event failed once retries run out).
+    """
+    try:
+        with transaction.atomic():
+            pending = (
+                PendingCheckout.objects.select_for_update()
+                .select_related('user', 'order')
+                .get(stripe_session_id=session_id)
             )
-    except (User.DoesNotExist, Product.DoesNotExist, KeyError, json.JSONDecodeError):
-        pass  # Optionally log error or handle as needed
-
+            if pending.order is not None:
+                return pending.order
+
+            lines = {
+                product_id: (quantity, Decimal(price))
+                for product_id, quantity, price in pending.lines
+            }
+            products = Product.objects.in_bulk(lines.keys())
+            missing = lines.keys() - products.keys()
+            if missing:
+                raise Product.DoesNotExist(f'Products {sorted(missing)} no longer exist')
+
+            first_product = products[next(iter(lines))]
+            order = Order.objects.create(
+                user=pending.user,
+                total=pending.total,
+                is_paid=True,
+                stripe_payment_intent_id=payment_intent,
+                item_count=sum(quantity for quantity, _ in lines.values()),
+                thumbnail=first_product.image.name or '',
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=products[product_id], quantity=quantity, price=price)
+                for product_id, (quantity, price) in lines.items()
+            ])
+
+            # Stock is already held when the checkout reservation is still pending
+            reservation = pending.reservation
+            if not (reservation and confirm_reservation(reservation)):
+                in_stock = Q()
+                for product_id, (quantity, _) in lines.items():
+                    in_stock |= Q(id=product_id, stock__gte=quantity)
+                updated = Product.objects.filter(in_stock).update(
+                    stock=Case(
+                        *[When(id=product_id, then=F('stock') - quantity)
+                          for product_id, (quantity, _) in lines.items()],
+                        default=F('stock'),
+                        output_field=models.PositiveIntegerField(),
+                    ),
+                    updated_on=Now(),
+                )
+                if updated != len(lines):
+                    raise InsufficientStock(f'Not enough stock to fulfil payment {payment_intent}')
+
+            record_sale(order, lines)
+            pending.order = order
+            pending.save(update_fields=['order'])
+        # The inbox worker runs this inside its own transaction, so wait
+        # until the new stock is visible to other connections
+        product_ids = list(lines)
+        transaction.on_commit(lambda: invalidate_snapshots(product_ids))
+    except (PendingCheckout.DoesNotExist, Product.DoesNotExist, InsufficientStock) as e:
+        logger.error('Could not fulfil order for payment %s: %s', payment_intent, e)
+        raise
+
+    return order
@@ -0,0 +1,50 @@
+# subscriptions/access.py
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from subscriptions.models import UserSubscription
+from subscriptions.plans import plan_catalog_version
+
+ACTIVE_TIMEOUT = 60 * 60
+# Cached in place of a subscription for users who have none
+NO_SUBSCRIPTION = 0
+
+
+def _key(user_id):
+    # The plan version is part of the key so plan edits are never served stale
+    return f'subscriptions:active:{user_id}:{plan_catalog_version()}'
+
+
+def get_active_subscription(user):
+    """
+    Return the user's active UserSubscription with its plan, or None.
+    Cached per user until their subscriptions change; a subscription whose
+    end date has passed counts as inactive even before the sweeper runs.
+    """
+    if not user.is_authenticated:
+        return None
+
+    key = _key(user.id)
+    subscription = cache.get(key)
+    if subscription is None:
+        subscription = (
+            UserSubscription.objects.filter(user_id=user.id, is_active=True)
+            .select_related('plan')
+            .first()
+        ) or NO_SUBSCRIPTION
+        cache.set(key, subscription, ACTIVE_TIMEOUT)
+
+    if subscription == NO_SUBSCRIPTION:
+        return None
+    if subscription.end_date and subscription.end_date <= timezone.now():
+        return None
+    return subscription
+
+
+def invalidate_active_subscription(user_id):
+    cache.delete(_key(user_id))
+
+
+def invalidate_active_subscriptions(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
@@ -1,15 +1,59 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, UserSubscription
+from django.db.models import Max, Min
+from .models import Feature, SubscriptionPlan, UserSubscription, SubscriptionPayment, PlanDailyMetrics
+from .metrics import metrics_summary
+from core.admin_tools import LargeTableAdminMixin, ReadOnlyReportAdmin
+
+@admin.register(Feature)
+class FeatureAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'bit')
+    search_fields = ('name', 'code')
+    prepopulated_fields = {'code': ('name',)}
 
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
     list_display = ('name', 'price', 'duration_days', 'is_active')
     list_filter = ('is_active',)
     search_fields = ('name', 'description')
+    filter_horizontal = ('features',)
 
 @admin.register(UserSubscription)
-class UserSubscriptionAdmin(admin.ModelAdmin):
+class UserSubscriptionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'plan', 'start_date', 'end_date', 'is_active')
     list_filter = ('is_active', 'plan')
-    search_fields = ('user__username', 'plan__name')
-    raw_id_fields = ('user', 'plan')
\ No newline at end of file
+    list_select_related = ('user', 'plan')
+    search_fields = ('=id', '=user__username', '=user__email')
+    autocomplete_fields = ('user', 'plan')
+
+
+@admin.register(SubscriptionPayment)
+class SubscriptionPaymentAdmin(admin.ModelAdmin):
+    list_display = ('payment_intent', 'subscription', 'plan', 'amount', 'created_at')
+    list_select_related = ('subscription__user', 'subscription__plan', 'plan')
+    search_fields = ('=payment_intent',)
+    autocomplete_fields = ('subscription', 'plan')
+
+
+@admin.register(PlanDailyMetrics)
+class PlanDailyMetricsAdmin(ReadOnlyReportAdmin):
+    """
+    Membership dashboard read from the daily metrics rows only: active
+    members, MRR and churn per plan for the days shown.
+    """
+    list_display = ('date', 'plan', 'new_count', 'renewed_count', 'expired_count', 'active_count', 'revenue')
+    list_filter = ('plan',)
+    list_select_related = ('plan',)
+    date_hierarchy = 'date'
+    change_list_template = 'admin/subscriptions/plandailymetrics/change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            days = response.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return response  # A redirect or an error page
+
+        span = days.aggregate(first=Min('date'), last=Max('date'))
+        summary = metrics_summary(span['first'], span['last']) if span['first'] else []
+        response.context_data.update(span=span, summary=summary)
+        return response
@@ -0,0 +1,89 @@
+# subscriptions/entitlements.py
+
+import logging
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.shortcuts import redirect
+
+from subscriptions.access import get_active_subscription
+from subscriptions.models import Feature, SubscriptionPlan
+from subscriptions.plans import PLANS_TIMEOUT, versioned_key
+
+logger = logging.getLogger(__name__)
+
+
+class Entitlements:
+    """
+    The features a user's plan grants, as a bitmask. Test with
+    `'code' in entitlements`; unknown feature codes are never granted.
+    """
+
+    def __init__(self, mask, bits):
+        self.mask = mask
+        self.bits = bits
+
+    def __contains__(self, code):
+        bit = self.bits.get(code)
+        if bit is None:
+            logger.warning('Unknown feature %r in an entitlement check', code)
+            return False
+        return bool(self.mask >> bit & 1)
+
+    def allows(self, *codes):
+        return all(code in self for code in codes)
+
+
+def entitlement_table():
+    """
+    Return ({feature code: bit}, {plan id: mask}), built with two queries
+    and cached until a plan or feature changes.
+    """
+    key = versioned_key('entitlements')
+    table = cache.get(key)
+    if table is None:
+        bits = dict(Feature.objects.values_list('code', 'bit'))
+        masks = {}
+        grants = SubscriptionPlan.features.through.objects.values_list('subscriptionplan_id', 'feature__bit')
+        for plan_id, bit in grants:
+            masks[plan_id] = masks.get(plan_id, 0) | 1 << bit
+        table = (bits, masks)
+        cache.set(key, table, PLANS_TIMEOUT)
+    return table
+
+
+def get_entitlements(request):
+    """
+    Return the Entitlements of the request's user, worked out once per
+    request from the cached active subscription and plan masks.
+    """
+    entitlements = getattr(request, '_entitlements', None)
+    if entitlements is None:
+        bits, masks = entitlement_table()
+        subscription = getattr(request, 'active_subscription', None)
+        if subscription is None:
+            subscription = get_active_subscription(request.user)
+        entitlements = Entitlements(masks.get(subscription.plan_id, 0) if subscription else 0, bits)
+        request._entitlements = entitlements
+    return entitlements
+
+
+def requires_entitlement(*codes):
+    """
+    Decorator for views open only to members whose plan grants every one
+    of the given features. Anonymous users are sent to log in, others to
+    the plans page.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path())
+            if not get_entitlements(request).allows(*codes):
+                messages.warning(request, 'Your membership does not include this. Choose a plan that does.')
+                return redirect('subscriptions:plans')
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,46 @@
+# subscriptions/expiry.py
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from subscriptions.access import invalidate_active_subscriptions
+from subscriptions.metrics import record_metrics
+from subscriptions.models import UserSubscription
+
+
+def expire_subscriptions(batch_size=1000, now=None):
+    """
+    Deactivate one batch of active subscriptions whose end date has passed,
+    oldest first, with one UPDATE per plan. Returns the number deactivated,
+    so callers can loop until it drops below `batch_size`. The batch is
+    locked, skipping rows another sweep or a payment holds, where the
+    database supports it; either way the plan metrics count only the rows
+    each UPDATE actually deactivated, so every expiry is counted once.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(
+            UserSubscription.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, end_date__lte=now)
+            .order_by('end_date')
+            .values_list('id', 'user_id', 'plan_id')[:batch_size]
+        )
+        if not expired:
+            return 0
+
+        by_plan = defaultdict(list)
+        for subscription_id, _, plan_id in expired:
+            by_plan[plan_id].append(subscription_id)
+        per_plan = {
+            plan_id: UserSubscription.objects.filter(id__in=ids, is_active=True)
+            .update(is_active=False, updated_at=now)
+            for plan_id, ids in by_plan.items()
+        }
+        record_metrics(
+            {plan_id: {'expired_count': n, 'active_count': -n} for plan_id, n in per_plan.items()},
+            day=timezone.localdate(now),
+        )
+    invalidate_active_subscriptions({user_id for _, user_id, _ in expired})
+    return sum(per_plan.values())
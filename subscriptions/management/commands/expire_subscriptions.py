@@ -0,0 +1,36 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from subscriptions.expiry import expire_subscriptions
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Deactivate subscriptions whose end date has passed, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping instead of exiting once nothing has expired.')
+        parser.add_argument('--sleep', type=float, default=60.0,
+                            help='Seconds between sweeps in --loop mode.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            expired = batches = 0
+            while True:
+                count = expire_subscriptions(batch_size=options['batch_size'])
+                expired += count
+                batches += 1
+                if count < options['batch_size']:
+                    break
+            elapsed = time.monotonic() - started
+            logger.info('Expired %d subscriptions in %d batches (%.0f ms)', expired, batches, elapsed * 1000)
+            self.stdout.write(f'Expired {expired} subscriptions in {batches} batches ({elapsed * 1000:.0f} ms).')
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from subscriptions.metrics import rebuild_metrics
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the per-plan daily subscription metrics from subscriptions and payments. '
+        'Run it if the counters are ever in doubt; they are otherwise kept up to date as '
+        'payments are fulfilled and subscriptions expire.'
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_metrics()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} plan metrics rows.'))
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import reverse
+
+from core.checks import cache_is_shared
+from subscriptions.plans import get_active_plans, get_cached_plans_page
+from subscriptions.views import plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the plans cache and render the anonymous plans page, so the first '
+        'visitors after a deploy or cache flush cost no database work. Run after migrate.'
+    )
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            raise CommandError(
+                'The default cache is local to each process, so this command would only '
+                'warm its own. Configure a shared cache (REDIS_URL) first.'
+            )
+        active_plans = get_active_plans()
+
+        request = RequestFactory().get(reverse('subscriptions:plans'))
+        request.user = AnonymousUser()
+        plans(request)
+
+        page = 'cached' if get_cached_plans_page() is not None else 'not cacheable (uses a CSRF token)'
+        self.stdout.write(self.style.SUCCESS(f'Cached {len(active_plans)} plans; plans page {page}.'))
@@ -0,0 +1,163 @@
+# subscriptions/metrics.py
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from subscriptions.models import PlanDailyMetrics, SubscriptionPayment, SubscriptionPlan, UserSubscription
+
+
+def latest_active_counts(plan_ids, before):
+    """
+    Active subscriptions per plan at the end of the last day with metrics
+    before `before`, in one query.
+    """
+    latest = (
+        PlanDailyMetrics.objects.filter(plan=OuterRef('pk'), date__lt=before)
+        .order_by('-date').values('active_count')[:1]
+    )
+    return dict(
+        SubscriptionPlan.objects.filter(id__in=plan_ids)
+        .annotate(active=Subquery(latest)).values_list('id', 'active')
+    )
+
+
+def record_metrics(changes, day=None):
+    """
+    Add counter changes to today's metrics rows. `changes` maps plan id ->
+    {field: delta}, e.g. {'new_count': 1, 'active_count': 1}. A plan's first row of
+    the day starts from its previous active count; the deltas are applied
+    with F() expressions, so concurrent writers never lose an update.
+    """
+    changes = {plan_id: deltas for plan_id, deltas in changes.items() if any(deltas.values())}
+    if not changes:
+        return
+    day = day or timezone.localdate()
+
+    existing = set(
+        PlanDailyMetrics.objects.filter(date=day, plan_id__in=changes).values_list('plan_id', flat=True)
+    )
+    missing = changes.keys() - existing
+    if missing:
+        carried = latest_active_counts(missing, before=day)
+        PlanDailyMetrics.objects.bulk_create([
+            PlanDailyMetrics(plan_id=plan_id, date=day, active_count=carried.get(plan_id) or 0)
+            for plan_id in missing
+        ], ignore_conflicts=True)
+
+    for plan_id, deltas in changes.items():
+        PlanDailyMetrics.objects.filter(plan_id=plan_id, date=day).update(**{
+            field: F(field) + delta for field, delta in deltas.items() if delta
+        })
+
+
+def rebuild_metrics():
+    """
+    Recompute every metrics row from subscriptions and payments. History
+    is approximated from what the tables keep: a subscription counts as
+    new on the day it was created, under its current plan, and as expired
+    on its end date once it is inactive; payments after a subscription's
+    first are renewals.
+    Returns the number of rows written.
+    """
+    today = timezone.localdate()
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    created = (
+        UserSubscription.objects.annotate(day=TruncDate('created_at'))
+        .values('plan_id', 'day').annotate(n=Count('id')).order_by()
+    )
+    for row in created:
+        deltas[row['plan_id'], row['day']]['new_count'] += row['n']
+
+    ended = (
+        UserSubscription.objects.filter(is_active=False, end_date__isnull=False)
+        .annotate(day=TruncDate('end_date'))
+        .values('plan_id', 'day').annotate(n=Count('id')).order_by()
+    )
+    for row in ended:
+        deltas[row['plan_id'], min(row['day'], today)]['expired_count'] += row['n']
+
+    # A subscription's first payment is the one that started it: date it
+    # with the subscription, whatever the payment row says
+    first_payments = SubscriptionPayment.objects.values('subscription').annotate(first=Min('id')).values('first')
+    paid = [
+        (SubscriptionPayment.objects.filter(id__in=first_payments), 'subscription__created_at', None),
+        (SubscriptionPayment.objects.exclude(id__in=first_payments), 'created_at', 'renewed_count'),
+    ]
+    for payments, dated_by, counter in paid:
+        rows = (
+            payments.annotate(day=TruncDate(dated_by))
+            .values('plan_id', 'day').annotate(n=Count('id'), total=Sum('amount')).order_by()
+        )
+        for row in rows:
+            counters = deltas[row['plan_id'], row['day']]
+            counters['revenue'] += row['total'] or Decimal(0)
+            if counter:
+                counters[counter] += row['n']
+
+    rows = []
+    active = defaultdict(int)
+    for plan_id, day in sorted(deltas):
+        counters = deltas[plan_id, day]
+        active[plan_id] += counters['new_count'] - counters['expired_count']
+        rows.append(PlanDailyMetrics(
+            plan_id=plan_id,
+            date=day,
+            new_count=counters['new_count'],
+            renewed_count=counters['renewed_count'],
+            expired_count=counters['expired_count'],
+            active_count=active[plan_id],
+            revenue=counters['revenue'],
+        ))
+
+    with transaction.atomic():
+        PlanDailyMetrics.objects.all().delete()
+        PlanDailyMetrics.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def metrics_summary(start, end):
+    """
+    Per-plan totals for the days from `start` to `end`, with active counts
+    and monthly recurring revenue at the end of the range and churn as
+    expirations over the active count at its start. Reads metrics rows only.
+    """
+    totals = {
+        row['plan_id']: row
+        for row in PlanDailyMetrics.objects.filter(date__range=(start, end))
+        .values('plan_id')
+        .annotate(new=Sum('new_count'), renewed=Sum('renewed_count'),
+                  expired=Sum('expired_count'), revenue=Sum('revenue'))
+        .order_by()
+    }
+    plans = list(SubscriptionPlan.objects.order_by('id'))
+    plan_ids = [plan.id for plan in plans]
+    active_at_start = latest_active_counts(plan_ids, before=start)
+    active_at_end = latest_active_counts(plan_ids, before=end + timedelta(days=1))
+
+    summary = []
+    for plan in plans:
+        row = totals.get(plan.id, {})
+        starting = active_at_start.get(plan.id) or 0
+        active = active_at_end.get(plan.id) or 0
+        if not (row or active):
+            continue
+        summary.append({
+            'plan': plan,
+            'new': row.get('new') or 0,
+            'renewed': row.get('renewed') or 0,
+            'expired': row.get('expired') or 0,
+            'revenue': row.get('revenue') or Decimal(0),
+            'active': active,
+            # Normalised to a 30-day month
+            'mrr': (plan.price * active * 30 / plan.duration_days).quantize(Decimal('0.01'))
+            if plan.duration_days else Decimal(0),
+            'churn': (row.get('expired') or 0) / starting * 100 if starting > 0 else None,
+        })
+    return summary
@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+
+from subscriptions.access import get_active_subscription
+
+
+class ActiveSubscriptionMiddleware:
+    """
+    Expose the user's active subscription as request.active_subscription,
+    looked up (from the cache) only when something reads it. Test it for
+    truth rather than against None, as it is a lazy object.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.active_subscription = SimpleLazyObject(lambda: get_active_subscription(request.user))
+        return self.get_response(request)
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_payments(apps, schema_editor):
+    # Every existing subscription was created from one checkout payment
+    UserSubscription = apps.get_model('subscriptions', 'UserSubscription')
+    SubscriptionPayment = apps.get_model('subscriptions', 'SubscriptionPayment')
+    subscriptions = (
+        UserSubscription.objects.exclude(stripe_subscription_id='')
+        .select_related('plan').order_by('id')
+    )
+    SubscriptionPayment.objects.bulk_create([
+        SubscriptionPayment(
+            payment_intent=subscription.stripe_subscription_id,
+            subscription=subscription,
+            plan=subscription.plan,
+            amount=subscription.plan.price,
+        )
+        for subscription in subscriptions.iterator()
+    ], batch_size=1000, ignore_conflicts=True)
+    # created_at is auto_now_add, so date each payment by its subscription
+    SubscriptionPayment.objects.update(
+        created_at=Subquery(
+            UserSubscription.objects.filter(pk=OuterRef('subscription_id')).values('created_at')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0002_subscription_expiry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_intent', models.CharField(max_length=255, unique=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='subscriptions.subscriptionplan')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='subscriptions.usersubscription')),
+            ],
+        ),
+        migrations.RunPython(backfill_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_metrics(apps, schema_editor):
+    # Same approximation as subscriptions.metrics.rebuild_metrics
+    UserSubscription = apps.get_model('subscriptions', 'UserSubscription')
+    SubscriptionPayment = apps.get_model('subscriptions', 'SubscriptionPayment')
+    PlanDailyMetrics = apps.get_model('subscriptions', 'PlanDailyMetrics')
+
+    today = timezone.localdate()
+    deltas = defaultdict(lambda: defaultdict(int))
+    created = (
+        UserSubscription.objects.annotate(day=TruncDate('created_at'))
+        .values('plan_id', 'day').annotate(n=Count('id')).order_by()
+    )
+    for row in created:
+        deltas[row['plan_id'], row['day']]['new'] += row['n']
+    ended = (
+        UserSubscription.objects.filter(is_active=False, end_date__isnull=False)
+        .annotate(day=TruncDate('end_date'))
+        .values('plan_id', 'day').annotate(n=Count('id')).order_by()
+    )
+    for row in ended:
+        deltas[row['plan_id'], min(row['day'], today)]['expired'] += row['n']
+    first_payments = SubscriptionPayment.objects.values('subscription').annotate(first=Min('id')).values('first')
+    paid = [
+        (SubscriptionPayment.objects.filter(id__in=first_payments), 'subscription__created_at', None),
+        (SubscriptionPayment.objects.exclude(id__in=first_payments), 'created_at', 'renewed'),
+    ]
+    for payments, dated_by, counter in paid:
+        rows = (
+            payments.annotate(day=TruncDate(dated_by))
+            .values('plan_id', 'day').annotate(n=Count('id'), total=Sum('amount')).order_by()
+        )
+        for row in rows:
+            deltas[row['plan_id'], row['day']]['revenue'] += row['total'] or 0
+            if counter:
+                deltas[row['plan_id'], row['day']][counter] += row['n']
+
+    rows = []
+    active = defaultdict(int)
+    for plan_id, day in sorted(deltas):
+        counters = deltas[plan_id, day]
+        active[plan_id] += counters['new'] - counters['expired']
+        rows.append(PlanDailyMetrics(
+            plan_id=plan_id, date=day,
+            new_count=counters['new'],
+            renewed_count=counters['renewed'],
+            expired_count=counters['expired'],
+            active_count=active[plan_id],
+            revenue=counters['revenue'],
+        ))
+    PlanDailyMetrics.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0003_subscriptionpayment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanDailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('new_count', models.PositiveIntegerField(default=0)),
+                ('renewed_count', models.PositiveIntegerField(default=0)),
+                ('expired_count', models.PositiveIntegerField(default=0)),
+                ('active_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='subscriptions.subscriptionplan')),
+            ],
+            options={
+                'verbose_name_plural': 'Plan daily metrics',
+                'ordering': ['-date', 'plan'],
+                'constraints': [models.UniqueConstraint(fields=('plan', 'date'), name='unique_plan_metrics_per_day')],
+            },
+        ),
+        migrations.RunPython(backfill_metrics, migrations.RunPython.noop),
+    ]
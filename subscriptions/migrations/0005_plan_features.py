@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0004_plandailymetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Feature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('bit', models.PositiveSmallIntegerField(editable=False, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='subscriptionplan',
+            name='features',
+            field=models.ManyToManyField(blank=True, related_name='plans', to='subscriptions.feature'),
+        ),
+    ]
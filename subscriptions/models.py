@@ -1,13 +1,36 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from datetime import timedelta
 
+class Feature(models.Model):
+    """
+    A named entitlement that plans can grant, e.g. 'classes' or
+    'member-pricing'. Each feature owns one bit of the entitlement mask
+    (see subscriptions.entitlements); the bit is assigned on creation.
+    """
+    code = models.SlugField(max_length=50, unique=True)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    bit = models.PositiveSmallIntegerField(unique=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            last = Feature.objects.aggregate(last=models.Max('bit'))['last']
+            self.bit = 0 if last is None else last + 1
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
 class SubscriptionPlan(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     price = models.DecimalField(max_digits=6, decimal_places=2)  # e.g., up to 9999.99
     duration_days = models.PositiveIntegerField()
     is_active = models.BooleanField(default=True)
+    features = models.ManyToManyField(Feature, blank=True, related_name='plans')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -29,11 +52,49 @@ class UserSubscription(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user'], condition=models.Q(is_active=True), name='unique_active_subscription')
         ]
+        indexes = [
+            # Finds expired subscriptions for the sweeper (subscriptions.expiry)
+            models.Index(fields=['is_active', 'end_date'], name='subscription_expiry_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.end_date and self.plan:
-            self.end_date = self.start_date + timedelta(days=self.plan.duration_days)
+            # start_date is only filled in by the INSERT itself
+            self.end_date = (self.start_date or timezone.now()) + timedelta(days=self.plan.duration_days)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.plan.name}"
+
+
+class SubscriptionPayment(models.Model):
+    """A Stripe payment applied to a subscription, recorded once per payment intent."""
+    payment_intent = models.CharField(max_length=255, unique=True)
+    subscription = models.ForeignKey(UserSubscription, on_delete=models.CASCADE, related_name='payments')
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=6, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.payment_intent
+
+
+class PlanDailyMetrics(models.Model):
+    """Per-plan subscription counters for one day, kept up to date by subscriptions.metrics."""
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.CASCADE, related_name='daily_metrics')
+    date = models.DateField()
+    new_count = models.PositiveIntegerField(default=0)
+    renewed_count = models.PositiveIntegerField(default=0)
+    expired_count = models.PositiveIntegerField(default=0)
+    active_count = models.IntegerField(default=0)  # Active subscriptions at the end of the day
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Plan daily metrics"
+        ordering = ['-date', 'plan']
+        constraints = [
+            models.UniqueConstraint(fields=['plan', 'date'], name='unique_plan_metrics_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.plan_id} on {self.date}"
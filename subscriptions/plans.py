@@ -0,0 +1,50 @@
+# subscriptions/plans.py
+
+import time
+
+from django.core.cache import cache
+
+from subscriptions.models import SubscriptionPlan
+
+PLAN_VERSION_KEY = 'subscriptions:plan-version'
+PLANS_TIMEOUT = 60 * 60 * 24
+
+
+def plan_catalog_version():
+    """
+    Version stamp of the subscription plans, changed whenever a plan is
+    saved or deleted. Used in cache keys for anything that embeds plan data.
+    """
+    version = cache.get(PLAN_VERSION_KEY)
+    if version is None:
+        cache.add(PLAN_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(PLAN_VERSION_KEY)
+    return version
+
+
+def bump_plan_catalog_version():
+    cache.set(PLAN_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+
+
+def versioned_key(name):
+    return f'subscriptions:{name}:{plan_catalog_version()}'
+
+
+def get_active_plans():
+    """
+    Return the active plans, cached until a plan changes.
+    """
+    key = versioned_key('active-plans')
+    plans = cache.get(key)
+    if plans is None:
+        plans = list(SubscriptionPlan.objects.filter(is_active=True).order_by('id'))
+        cache.set(key, plans, PLANS_TIMEOUT)
+    return plans
+
+
+def get_cached_plans_page():
+    return cache.get(versioned_key('plans-page'))
+
+
+def cache_plans_page(content):
+    cache.set(versioned_key('plans-page'), content, PLANS_TIMEOUT)
@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from .access import invalidate_active_subscription
+from .models import Feature, SubscriptionPlan, UserSubscription
+from .plans import bump_plan_catalog_version
+
+
+@receiver([post_save, post_delete], sender=UserSubscription)
+def refresh_active_subscription(sender, instance, **kwargs):
+    """
+    Drop the user's cached active subscription once the change is committed.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_active_subscription(user_id))
+
+
+@receiver([post_save, post_delete], sender=SubscriptionPlan)
+@receiver([post_save, post_delete], sender=Feature)
+def refresh_plan_catalog(sender, instance, **kwargs):
+    """
+    Retire every cache entry that embeds plan data, entitlements included.
+    """
+    transaction.on_commit(bump_plan_catalog_version)
+
+
+@receiver(m2m_changed, sender=SubscriptionPlan.features.through)
+def refresh_plan_features(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_plan_catalog_version)
@@ -0,0 +1,13 @@
+from django import template
+
+from subscriptions.entitlements import get_entitlements
+
+register = template.Library()
+
+
+@register.filter
+def entitled(request, code):
+    """
+    Whether the user's plan grants a feature, e.g. {% if request|entitled:'classes' %}
+    """
+    return code in get_entitlements(request)
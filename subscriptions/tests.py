@@ -1,3 +1,405 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .access import get_active_subscription
+from .entitlements import get_entitlements, requires_entitlement
+from .expiry import expire_subscriptions
+from .middleware import ActiveSubscriptionMiddleware
+from .metrics import metrics_summary, rebuild_metrics
+from .models import Feature, PlanDailyMetrics, SubscriptionPayment, SubscriptionPlan, UserSubscription
+from .plans import get_cached_plans_page
+from .views import fulfill_subscription
+
+
+class ActiveSubscriptionTests(TestCase):
+    """
+    request.active_subscription is looked up only when read, at most once
+    per request, and from the cache until the user's subscription changes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        cls.plan = SubscriptionPlan.objects.create(
+            name='Monthly', description='All classes', price=Decimal('30.00'), duration_days=30
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def subscribe(self, days=30):
+        with self.captureOnCommitCallbacks(execute=True):
+            return UserSubscription.objects.create(
+                user=self.user, plan=self.plan, end_date=timezone.now() + timedelta(days=days),
+                stripe_subscription_id='pi_1',
+            )
+
+    def run_request(self, view):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return ActiveSubscriptionMiddleware(lambda request: view(request) or HttpResponse())(request)
+
+    def test_not_looked_up_unless_read(self):
+        with self.assertNumQueries(0):
+            self.run_request(lambda request: None)
+
+    def test_one_query_per_request_then_cached(self):
+        subscription = self.subscribe()
+
+        def read_twice(request):
+            self.assertEqual(request.active_subscription, subscription)
+            self.assertEqual(request.active_subscription.plan.name, 'Monthly')
+
+        with self.assertNumQueries(1):
+            self.run_request(read_twice)
+        with self.assertNumQueries(0):
+            self.run_request(read_twice)
+
+    def test_no_subscription_is_cached_too(self):
+        self.assertIsNone(get_active_subscription(self.user))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_active_subscription(self.user))
+
+    def test_past_end_date_counts_as_inactive(self):
+        self.subscribe(days=-1)
+        self.assertIsNone(get_active_subscription(self.user))
+
+    def test_cache_follows_saves_and_deletes(self):
+        subscription = self.subscribe()
+        self.assertEqual(get_active_subscription(self.user), subscription)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.is_active = False
+            subscription.save()
+        self.assertIsNone(get_active_subscription(self.user))
+
+        subscription = self.subscribe()
+        self.assertEqual(get_active_subscription(self.user), subscription)
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.delete()
+        self.assertIsNone(get_active_subscription(self.user))
+
+    def test_cache_follows_plan_changes(self):
+        self.subscribe()
+        self.assertEqual(get_active_subscription(self.user).plan.name, 'Monthly')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            plan = SubscriptionPlan.objects.get(id=self.plan.id)
+            plan.name = 'Monthly Plus'
+            plan.save()
+        self.assertEqual(get_active_subscription(self.user).plan.name, 'Monthly Plus')
+
+
+class SubscriptionExpiryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(
+            name='Monthly', description='All classes', price=Decimal('30.00'), duration_days=30
+        )
+
+    def create_subscriptions(self, count, days):
+        end_date = timezone.now() + timedelta(days=days)
+        users = [
+            User.objects.create_user(username=f'member{days}x{i}', password='pass12345')
+            for i in range(count)
+        ]
+        UserSubscription.objects.bulk_create([
+            UserSubscription(user=user, plan=self.plan, end_date=end_date, stripe_subscription_id=f'pi_{user.id}')
+            for user in users
+        ])
+
+    def test_deactivates_lapsed_subscriptions_in_batches(self):
+        self.create_subscriptions(3, days=-1)
+        self.create_subscriptions(2, days=10)
+
+        self.assertEqual(expire_subscriptions(batch_size=2), 2)
+        self.assertEqual(expire_subscriptions(batch_size=2), 1)
+        self.assertEqual(expire_subscriptions(batch_size=2), 0)
+        self.assertEqual(UserSubscription.objects.filter(is_active=True).count(), 2)
+        self.assertFalse(UserSubscription.objects.filter(is_active=True, end_date__lte=timezone.now()).exists())
+
+    def test_command_sweeps_everything(self):
+        self.create_subscriptions(3, days=-1)
+        out = StringIO()
+        call_command('expire_subscriptions', batch_size=2, stdout=out)
+        self.assertIn('Expired 3 subscriptions in 2 batches', out.getvalue())
+
+
+class FulfillSubscriptionTests(TestCase):
+    """
+    Each Stripe payment is applied to a subscription exactly once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        cls.monthly = SubscriptionPlan.objects.create(
+            name='Monthly', description='All classes', price=Decimal('30.00'), duration_days=30
+        )
+        cls.yearly = SubscriptionPlan.objects.create(
+            name='Yearly', description='All classes', price=Decimal('300.00'), duration_days=365
+        )
+
+    def test_redelivered_payment_is_applied_once(self):
+        subscription = fulfill_subscription(self.monthly.id, self.user.id, 'pi_1')
+        self.assertEqual(fulfill_subscription(self.monthly.id, self.user.id, 'pi_1'), subscription)
+
+        self.assertEqual(UserSubscription.objects.count(), 1)
+        self.assertEqual(SubscriptionPayment.objects.get().subscription, subscription)
+        subscription.refresh_from_db()
+        self.assertAlmostEqual(subscription.end_date, timezone.now() + timedelta(days=30), delta=timedelta(minutes=1))
+
+    def test_renewal_extends_the_active_subscription(self):
+        first = fulfill_subscription(self.monthly.id, self.user.id, 'pi_1')
+        renewed = fulfill_subscription(self.yearly.id, self.user.id, 'pi_2')
+
+        self.assertEqual(renewed.id, first.id)
+        self.assertEqual(renewed.plan, self.yearly)
+        self.assertEqual(renewed.end_date, first.end_date + timedelta(days=365))
+        self.assertEqual(SubscriptionPayment.objects.filter(subscription=first).count(), 2)
+
+    def test_lapsed_subscription_is_replaced(self):
+        lapsed = fulfill_subscription(self.monthly.id, self.user.id, 'pi_1')
+        UserSubscription.objects.filter(id=lapsed.id).update(end_date=timezone.now() - timedelta(days=1))
+
+        fresh = fulfill_subscription(self.monthly.id, self.user.id, 'pi_2')
+        self.assertNotEqual(fresh.id, lapsed.id)
+        lapsed.refresh_from_db()
+        self.assertFalse(lapsed.is_active)
+
+    def test_unknown_plan_raises(self):
+        with self.assertRaises(SubscriptionPlan.DoesNotExist):
+            fulfill_subscription(0, self.user.id, 'pi_1')
+        self.assertFalse(SubscriptionPayment.objects.exists())
+
+
+class PaymentBackfillMigrationTests(TransactionTestCase):
+    """
+    Migrating to 0003 records one payment per existing subscription, dated
+    with the subscription.
+    """
+
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def test_backfill_payments(self):
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes('subscriptions')
+        self.addCleanup(self.migrate, *latest)
+        old_apps = self.migrate(('subscriptions', '0002_subscription_expiry_index'))
+        user = old_apps.get_model('auth', 'User').objects.create(username='member')
+        plan = old_apps.get_model('subscriptions', 'SubscriptionPlan').objects.create(
+            name='Monthly', description='All classes', price=Decimal('30.00'), duration_days=30
+        )
+        OldSubscription = old_apps.get_model('subscriptions', 'UserSubscription')
+        subscription = OldSubscription.objects.create(user=user, plan=plan, stripe_subscription_id='pi_1')
+        created_at = timezone.now() - timedelta(days=90)
+        OldSubscription.objects.filter(id=subscription.id).update(created_at=created_at)
+        OldSubscription.objects.create(user=user, plan=plan, is_active=False, stripe_subscription_id='')
+
+        new_apps = self.migrate(('subscriptions', '0003_subscriptionpayment'))
+        payment = new_apps.get_model('subscriptions', 'SubscriptionPayment').objects.get()
+        self.assertEqual(payment.payment_intent, 'pi_1')
+        self.assertEqual(payment.subscription_id, subscription.id)
+        self.assertEqual(payment.amount, Decimal('30.00'))
+        self.assertEqual(payment.created_at, created_at)
+
+
+class PlanMetricsTests(TestCase):
+    """
+    Payments and expiries keep today's per-plan counters up to date, and a
+    rebuild from the tables arrives at the same numbers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.monthly = SubscriptionPlan.objects.create(
+            name='Monthly', description='All classes', price=Decimal('30.00'), duration_days=30
+        )
+        cls.yearly = SubscriptionPlan.objects.create(
+            name='Yearly', description='All classes', price=Decimal('300.00'), duration_days=360
+        )
+        cls.users = [
+            User.objects.create_user(username=f'member{i}', password='pass12345')
+            for i in range(4)
+        ]
+
+    def today(self, plan):
+        return PlanDailyMetrics.objects.get(plan=plan, date=timezone.localdate())
+
+    def metrics_rows(self):
+        return list(PlanDailyMetrics.objects.order_by('plan', 'date').values(
+            'plan', 'date', 'new_count', 'renewed_count', 'expired_count', 'active_count', 'revenue'
+        ))
+
+    def subscribe_everyone(self):
+        fulfill_subscription(self.monthly.id, self.users[0].id, 'pi_0')
+        fulfill_subscription(self.monthly.id, self.users[1].id, 'pi_1')
+        fulfill_subscription(self.yearly.id, self.users[2].id, 'pi_2')
+        fulfill_subscription(self.monthly.id, self.users[0].id, 'pi_3')  # Renewal
+
+    def test_payments_update_todays_counters(self):
+        self.subscribe_everyone()
+
+        monthly = self.today(self.monthly)
+        self.assertEqual((monthly.new_count, monthly.renewed_count, monthly.active_count), (2, 1, 2))
+        self.assertEqual(monthly.revenue, Decimal('90.00'))
+        yearly = self.today(self.yearly)
+        self.assertEqual((yearly.new_count, yearly.active_count, yearly.revenue), (1, 1, Decimal('300.00')))
+
+    def test_expiry_is_counted_per_plan(self):
+        self.subscribe_everyone()
+        UserSubscription.objects.filter(user__in=self.users[1:3]).update(
+            end_date=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.assertEqual(expire_subscriptions(), 2)
+        self.assertEqual(expire_subscriptions(), 0)
+        for plan in (self.monthly, self.yearly):
+            metrics = self.today(plan)
+            self.assertEqual(metrics.expired_count, 1)
+        self.assertEqual(self.today(self.monthly).active_count, 1)
+        self.assertEqual(self.today(self.yearly).active_count, 0)
+
+    def test_rebuild_matches_the_incremental_counters(self):
+        self.subscribe_everyone()
+        UserSubscription.objects.filter(user=self.users[1]).update(end_date=timezone.now() - timedelta(minutes=1))
+        expire_subscriptions()
+        incremental = self.metrics_rows()
+
+        self.assertEqual(rebuild_metrics(), 2)
+        self.assertEqual(self.metrics_rows(), incremental)
+
+    def test_summary(self):
+        self.subscribe_everyone()
+        today = timezone.localdate()
+        summary = {row['plan']: row for row in metrics_summary(today, today)}
+
+        self.assertEqual(summary[self.monthly]['active'], 2)
+        self.assertEqual(summary[self.monthly]['mrr'], Decimal('60.00'))
+        self.assertEqual(summary[self.yearly]['mrr'], Decimal('25.00'))
+        self.assertIsNone(summary[self.monthly]['churn'])
+
+
+class EntitlementTests(TestCase):
+    """
+    Plans grant features as bits of a mask, checked without queries once
+    the plan table is cached.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='pass12345')
+        cls.classes = Feature.objects.create(code='classes', name='Group classes')
+        cls.pool = Feature.objects.create(code='pool', name='Pool access')
+        cls.coaching = Feature.objects.create(code='coaching', name='Personal coaching')
+        cls.plan = SubscriptionPlan.objects.create(
+            name='Monthly', description='All classes', price=Decimal('30.00'), duration_days=30
+        )
+        cls.plan.features.add(cls.classes, cls.pool)
+
+    def setUp(self):
+        cache.clear()
+
+    def request_for(self, user):
+        request = RequestFactory().get('/members/')
+        request.user = user
+        request._messages = CookieStorage(request)
+        return request
+
+    def subscribe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscription.objects.create(
+                user=self.user, plan=self.plan, end_date=timezone.now() + timedelta(days=30),
+                stripe_subscription_id='pi_1',
+            )
+
+    def test_features_get_consecutive_bits(self):
+        self.assertEqual([self.classes.bit, self.pool.bit, self.coaching.bit], [0, 1, 2])
+
+    def test_plan_grants_its_features_only(self):
+        self.subscribe()
+        entitlements = get_entitlements(self.request_for(self.user))
+
+        self.assertIn('classes', entitlements)
+        self.assertTrue(entitlements.allows('classes', 'pool'))
+        self.assertNotIn('coaching', entitlements)
+        self.assertNotIn('unknown', entitlements)
+
+    def test_no_subscription_grants_nothing(self):
+        self.assertNotIn('classes', get_entitlements(self.request_for(self.user)))
+        self.assertNotIn('classes', get_entitlements(self.request_for(AnonymousUser())))
+
+    def test_checked_without_queries_once_cached(self):
+        self.subscribe()
+        get_entitlements(self.request_for(self.user))
+
+        with self.assertNumQueries(0):
+            request = self.request_for(self.user)
+            self.assertIn('pool', get_entitlements(request))
+            self.assertIs(get_entitlements(request), get_entitlements(request))
+
+    def test_granting_a_feature_takes_effect(self):
+        self.subscribe()
+        self.assertNotIn('coaching', get_entitlements(self.request_for(self.user)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.features.add(self.coaching)
+        self.assertIn('coaching', get_entitlements(self.request_for(self.user)))
+
+    def test_requires_entitlement(self):
+        view = requires_entitlement('classes')(lambda request: HttpResponse('timetable'))
+
+        response = view(self.request_for(AnonymousUser()))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/accounts/login/', response['Location'])
+
+        response = view(self.request_for(self.user))
+        self.assertRedirects(response, '/subscriptions/', fetch_redirect_response=False)
+
+        self.subscribe()
+        self.assertEqual(view(self.request_for(self.user)).content, b'timetable')
+
+
+class WarmPlansCacheCommandTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        SubscriptionPlan.objects.create(
+            name='Monthly', description='All classes', price=Decimal('30.00'), duration_days=30
+        )
+
+    def test_caches_the_anonymous_plans_page(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        shared_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_dir,
+        }}
+        with override_settings(CACHES=shared_cache):
+            out = StringIO()
+            call_command('warm_plans_cache', stdout=out)
+            self.assertIn('Cached 1 plans; plans page cached.', out.getvalue())
+            self.assertIn(b'Monthly', get_cached_plans_page())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refuses_a_per_process_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('warm_plans_cache', stdout=StringIO())
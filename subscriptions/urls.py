@@ -5,4 +5,8 @@ app_name = 'subscriptions'
 
 urlpatterns = [
     path('', views.plans, name='plans'),  # Shows list of plans
+    path('subscribe/<int:plan_id>/', views.subscribe, name='subscribe'),
+    path('success/', views.subscription_success, name='subscription_success'),
+    path('cancel/', views.subscription_cancel, name='subscription_cancel'),
+    path('webhook/', views.stripe_webhook, name='stripe_webhook'),
 ]
@@ -1,26 +1,47 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.conf import settings
-from django.views.decorators.csrf import csrf_exempt
+from django.contrib.messages import get_messages
 from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 
-import stripe
+import logging
+from collections import defaultdict
 from datetime import timedelta
 
-from .models import SubscriptionPlan, UserSubscription
+from .models import SubscriptionPlan, UserSubscription, SubscriptionPayment
+from .metrics import record_metrics
+from .plans import plan_catalog_version, get_active_plans, get_cached_plans_page, cache_plans_page
+from core.conditional import public_condition
+from core.stripe_gateway import create_checkout_session
+from core.webhooks import receive_stripe_event
+
+logger = logging.getLogger(__name__)
+
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+def plans_etag(request):
+    return f'plans-{plan_catalog_version()}'
 
 
+@public_condition(etag_func=plans_etag)
 def plans(request):
     """
-    Display all active subscription plans.
+    Display all active subscription plans. The plans come from the cache,
+    and the page anonymous visitors see is rendered once per plan catalog
+    version, unless it carries a per-visitor CSRF token.
     """
-    active_plans = SubscriptionPlan.objects.filter(is_active=True)
-    return render(request, 'subscriptions/plans.html', {'plans': active_plans})
+    shared = not request.user.is_authenticated and not len(get_messages(request))
+    if shared:
+        content = get_cached_plans_page()
+        if content is not None:
+            return HttpResponse(content)
+
+    response = render(request, 'subscriptions/plans.html', {'plans': get_active_plans()})
+    if shared and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        cache_plans_page(response.content)
+    return response
 
 
 @login_required
@@ -34,17 +55,13 @@ def subscribe(request, plan_id):
         messages.error(request, 'Selected subscription plan does not exist.')
         return redirect('subscriptions:plans')
 
-    existing_subscription = UserSubscription.objects.filter(
-        user=request.user,
-        is_active=True
-    ).first()
-
+    existing_subscription = request.active_subscription
     if existing_subscription:
         messages.warning(request, f"You already have an active subscription: {existing_subscription.plan.name}")
         return redirect('profile')
 
     try:
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = create_checkout_session(
             payment_method_types=['card'],
             line_items=[{
                 'price_data': {
@@ -100,18 +117,15 @@ def subscription_cancel(request):
 @csrf_exempt
 def stripe_webhook(request):
     """
-    Handle Stripe webhook for completed checkout sessions.
+    Receive Stripe webhooks; see core.webhooks for the inbox mode.
     """
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
+    return receive_stripe_event(request, 'subscriptions')
 
-    try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
-    except (ValueError, stripe.error.SignatureVerificationError):
-        return HttpResponse(status=400)
 
+def handle_stripe_event(event):
+    """
+    Handle Stripe webhook for completed checkout sessions.
+    """
     if event['type'] == 'checkout.session.completed':
         session = event['data']['object']
         fulfill_subscription(
@@ -120,29 +134,86 @@ def stripe_webhook(request):
             session.payment_intent
         )
 
-    return HttpResponse(status=200)
-
 
 def fulfill_subscription(plan_id, user_id, payment_intent):
     """
-    Create a new user subscription after successful Stripe payment.
+    Apply a successful Stripe payment to the user's subscription, once per
+    payment intent: a redelivered webhook costs one indexed lookup, and
+    the unique payment intent rolls back a concurrent duplicate. A user
+    with an active subscription has it locked and extended by the plan's
+    duration; otherwise a new subscription starts. All changes, including
+    the plan metrics, happen in one transaction.
     """
-    User = get_user_model()
+    applied = _subscription_for_payment(payment_intent)
+    if applied is not None:
+        return applied
 
     try:
         plan = SubscriptionPlan.objects.get(id=plan_id)
-        user = User.objects.get(id=user_id)
-    except (SubscriptionPlan.DoesNotExist, User.DoesNotExist):
-        return
-
-    start_date = timezone.now()
-    end_date = start_date + timedelta(days=plan.duration_days)
-
-    UserSubscription.objects.create(
-        user=user,
-        plan=plan,
-        start_date=start_date,
-        end_date=end_date,
-        is_active=True,
-        stripe_subscription_id=payment_intent
+    except SubscriptionPlan.DoesNotExist:
+        # Raised so the webhook is retried and, failing that, kept as failed
+        logger.error('Cannot fulfil payment %s: plan %s does not exist', payment_intent, plan_id)
+        raise
+
+    try:
+        with transaction.atomic():
+            now = timezone.now()
+            subscription = (
+                UserSubscription.objects.select_for_update()
+                .select_related('plan')
+                .filter(user_id=user_id, is_active=True)
+                .first()
+            )
+            changes = defaultdict(lambda: defaultdict(int))
+            if subscription is not None and subscription.end_date and subscription.end_date <= now:
+                # Lapsed but not yet swept: close it and start afresh
+                subscription.is_active = False
+                subscription.save(update_fields=['is_active', 'updated_at'])
+                changes[subscription.plan_id]['expired_count'] += 1
+                changes[subscription.plan_id]['active_count'] -= 1
+                subscription = None
+
+            if subscription is None:
+                subscription = UserSubscription.objects.create(
+                    user_id=user_id,
+                    plan=plan,
+                    end_date=now + timedelta(days=plan.duration_days),
+                    stripe_subscription_id=payment_intent,
+                )
+                changes[plan.id]['new_count'] += 1
+                changes[plan.id]['active_count'] += 1
+            else:
+                changes[plan.id]['renewed_count'] += 1
+                if subscription.plan_id != plan.id:
+                    changes[subscription.plan_id]['active_count'] -= 1
+                    changes[plan.id]['active_count'] += 1
+                subscription.plan = plan
+                subscription.end_date = max(subscription.end_date or now, now) + timedelta(days=plan.duration_days)
+                subscription.stripe_subscription_id = payment_intent
+                subscription.save(update_fields=['plan', 'end_date', 'stripe_subscription_id', 'updated_at'])
+
+            SubscriptionPayment.objects.create(
+                payment_intent=payment_intent,
+                subscription=subscription,
+                plan=plan,
+                amount=plan.price,
+            )
+            changes[plan.id]['revenue'] += plan.price
+            record_metrics(changes)
+    except IntegrityError:
+        # Lost a race with a duplicate delivery of this payment; anything
+        # else (say two first subscriptions at once) is raised to be retried
+        applied = _subscription_for_payment(payment_intent)
+        if applied is None:
+            raise
+        return applied
+
+    return subscription
+
+
+def _subscription_for_payment(payment_intent):
+    return (
+        UserSubscription.objects.select_related('plan')
+        .filter(payments__payment_intent=payment_intent)
+        .first()
     )